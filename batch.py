@@ -0,0 +1,222 @@
+# File: batch.py
+
+"""
+Génération en lot, sans Streamlit.
+
+Usage : python batch.py jobs.json [--workers N] [--mesures mesures.json] [--profil]
+
+Le fichier de jobs est un JSON de la forme :
+
+{
+    "excel": "data/Données de références.xlsx",
+    "img_dir": "img",
+    "logos_dir": "logos",
+    "valeur_blason": "x",
+    "jobs": [
+        {
+            "modele": "data/Modele_presentation_V4.pptx",
+            "sortie": "sorties/marseille.pptx",
+            "filtres": {"Ville": ["Marseille"]},
+            "tri": {"colonne": "montant des travaux", "croissant": false},
+            "mapping": {"{{Ville}}": "Ville"},
+            "slides_prototypes": [0],
+            "moteur": "xml"
+        },
+        {
+            "modele": "data/Modele_presentation_V4.pptx",
+            "par": "Maitre d'ouvrage",
+            "sortie": "sorties/moa_{valeur}.pptx",
+            "slides_prototypes": [0]
+        }
+    ]
+}
+
+`mapping` est optionnel (PLACEHOLDERS_DEFAULT sur les colonnes présentes).
+`par` produit un deck par valeur distincte de la colonne, `{valeur}` étant
+remplacé dans `sortie`. `"incremental": true` ne régénère que les slides
+dont la ligne a changé depuis la génération précédente de `sortie`.
+`"moteur": "xml"` (par job ou pour tout le lot) utilise le moteur XML brut.
+`"volumes": N` découpe le deck en volumes de N projets (mémoire bornée) :
+`sortie` en .zip donne une archive des volumes, sinon `sortie_001.pptx`...
+`"processus": N` (par job ou pour tout le lot) rend les slides clonées d'un
+deck sur N processus ; à réserver aux gros decks lancés avec peu de workers.
+
+`--mesures` écrit, pour chaque sortie, le rapport de génération (durées par
+étape et par slide, compteurs) ; `--profil` y ajoute un profil cProfile.
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+
+from config import DOSSIER_CACHE, PLACEHOLDERS_DEFAULT
+from logger_config import get_logger
+from presentation_generator import exporter_volumes, generate_presentation
+from utils.data_utils import appliquer_filtres
+from utils.dataset_utils import charger_classeur
+
+# État de chaque worker : DataFrame et modèles chargés une seule fois
+_DF = None
+_MODELES = {}
+
+
+def charger_excel(chemin):
+    """
+    Lit le classeur de référence comme dans l'interface (colonnes typées,
+    cache Parquet).
+    """
+    return charger_classeur(chemin, DOSSIER_CACHE)[0]
+
+
+def _init_worker(chemin_excel):
+    global _DF
+    _DF = charger_excel(chemin_excel)
+
+
+def _modele(chemin):
+    if chemin not in _MODELES:
+        with open(chemin, 'rb') as f:
+            _MODELES[chemin] = f.read()
+    return _MODELES[chemin]
+
+
+def preparer_df(df, job):
+    """
+    Applique filtres et tri d'un job au DataFrame complet.
+    """
+    df_job = appliquer_filtres(df, job.get('filtres', {}))
+    tri = job.get('tri')
+    if tri:
+        df_job = df_job.sort_values(by=tri['colonne'], ascending=tri.get('croissant', True))
+    return df_job
+
+
+def mapping_defaut(colonnes):
+    """
+    Mapping par défaut : PLACEHOLDERS_DEFAULT limité aux colonnes présentes.
+    """
+    return {ph: (col if col in colonnes else '') for ph, col in PLACEHOLDERS_DEFAULT.items()}
+
+
+def executer_job(job, options):
+    """
+    Génère le deck d'un job dans un worker.
+    Renvoie (sortie, lignes, secondes, erreur, rapport).
+    """
+    debut = time.perf_counter()
+    rapport = {}
+    try:
+        df_job = preparer_df(_DF, job)
+        dossier = os.path.dirname(job['sortie'])
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+        args = dict(
+            model_path=BytesIO(_modele(job['modele'])),
+            df=df_job,
+            placeholders_mapping=job.get('mapping') or mapping_defaut(_DF.columns),
+            img_dir=options['img_dir'],
+            logos_dir=options['logos_dir'],
+            valeur_blason_active=options['valeur_blason'],
+            slides_prototypes=job.get('slides_prototypes'),
+            sortie=job['sortie'],
+            incremental=job.get('incremental', False),
+            moteur=job.get('moteur', options.get('moteur', 'pptx')),
+            processus=job.get('processus', options.get('processus', 1)),
+        )
+        if job.get('volumes'):
+            exporter_volumes(taille_volume=job['volumes'], archive=job['sortie'].endswith('.zip'), **args)
+        else:
+            generate_presentation(rapport=rapport, profil_cpu=options.get('profil', False), **args)
+        return job['sortie'], len(df_job), time.perf_counter() - debut, None, rapport
+    except Exception as e:
+        return job['sortie'], 0, time.perf_counter() - debut, f"{type(e).__name__}: {e}", rapport
+
+
+def developper_jobs(jobs, chemin_excel):
+    """
+    Remplace chaque job `par` colonne par un job par valeur distincte.
+    """
+    if not any('par' in job for job in jobs):
+        return list(jobs)
+    df = charger_excel(chemin_excel)
+    resultat = []
+    for job in jobs:
+        if 'par' not in job:
+            resultat.append(job)
+            continue
+        colonne = job['par']
+        base = preparer_df(df, job)
+        for valeur in sorted(base[colonne].dropna().unique()):
+            nom = re.sub(r'[^\w\-]+', '_', str(valeur)).strip('_') or 'vide'
+            filtres = dict(job.get('filtres', {}))
+            filtres[colonne] = [valeur]
+            resultat.append({**{k: v for k, v in job.items() if k != 'par'},
+                             'filtres': filtres,
+                             'sortie': job['sortie'].format(valeur=nom)})
+    return resultat
+
+
+def lancer_lot(spec, workers=None, profil=False):
+    """
+    Exécute tous les jobs de `spec` sur un pool de processus.
+    Renvoie la liste des résultats (sortie, lignes, secondes, erreur, rapport).
+    """
+    logger = get_logger(__name__)
+    options = {
+        'img_dir': spec.get('img_dir', 'img'),
+        'logos_dir': spec.get('logos_dir', 'logos'),
+        'valeur_blason': spec.get('valeur_blason', 'x'),
+        'profil': profil,
+        'moteur': spec.get('moteur', 'pptx'),
+        'processus': spec.get('processus', 1),
+    }
+    jobs = developper_jobs(spec['jobs'], spec['excel'])
+    logger.info(f"{len(jobs)} job(s) à générer")
+
+    resultats = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(spec['excel'],)) as pool:
+        futures = [pool.submit(executer_job, job, options) for job in jobs]
+        for future in as_completed(futures):
+            resultat = future.result()
+            if resultat[3]:
+                logger.warning(f"Échec {resultat[0]}: {resultat[3]}")
+            resultats.append(resultat)
+    return resultats
+
+
+def afficher_resume(resultats, duree_totale):
+    largeur = max([len(r[0]) for r in resultats] + [6])
+    print(f"{'Sortie':<{largeur}}  {'Lignes':>6}  {'Durée':>8}  Statut")
+    for sortie, lignes, secondes, erreur, _ in sorted(resultats, key=lambda r: r[0]):
+        print(f"{sortie:<{largeur}}  {lignes:>6}  {secondes:>7.2f}s  {erreur or 'OK'}")
+    echecs = sum(1 for r in resultats if r[3])
+    print(f"{len(resultats)} job(s), {echecs} échec(s), {duree_totale:.2f}s au total")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Génération PPTX en lot')
+    parser.add_argument('spec', help='fichier JSON décrivant les jobs')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='nombre de processus (défaut : tous les coeurs)')
+    parser.add_argument('--mesures', help='fichier JSON où écrire les mesures de chaque job')
+    parser.add_argument('--profil', action='store_true', help='ajoute un profil cProfile aux mesures')
+    args = parser.parse_args(argv)
+
+    with open(args.spec, encoding='utf-8') as f:
+        spec = json.load(f)
+    debut = time.perf_counter()
+    resultats = lancer_lot(spec, args.workers, args.profil)
+    afficher_resume(resultats, time.perf_counter() - debut)
+    if args.mesures:
+        with open(args.mesures, 'w', encoding='utf-8') as f:
+            json.dump({r[0]: r[4] for r in resultats}, f, indent=2, ensure_ascii=False)
+    return 1 if any(r[3] for r in resultats) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,326 @@
+# File: benchmark.py
+
+"""
+Benchmarks de la génération, étape par étape, sur données synthétiques.
+
+Usage :
+    python benchmark.py                              # compare à la baseline si elle existe
+    python benchmark.py --enregistrer                # enregistre la baseline
+    python benchmark.py --tailles 10 1000 50000 --modeles 11x1 11x3 40x3
+
+Chaque scénario (nombre de lignes x modèle) génère un classeur synthétique
+(colonnes de PLACEHOLDERS_DEFAULT et de MAPPING_BLASONS) et un modèle
+synthétique (n placeholders découpés en k runs), puis mesure séparément :
+chargement du modèle, découverte des placeholders, plan de rendu, clonage,
+substitution du texte, remplacement d'image, blasons et sauvegarde.
+Le temps et le pic mémoire (tracemalloc, passe séparée) sont enregistrés en
+JSON ; une étape plus lente que la baseline au-delà du seuil fait échouer
+la commande (code 1). Le temps d'import du coeur est aussi contrôlé.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+from config import MAPPING_BLASONS, PLACEHOLDERS_DEFAULT, TYPES_FORMATAGE
+
+ETAPES = ['chargement_modele', 'decouverte_placeholders', 'plan_rendu', 'clonage',
+          'textes', 'images', 'blasons', 'sauvegarde']
+
+# Modules qui ne doivent pas être chargés par un simple import du coeur
+MODULES_LOURDS = ['pandas', 'numpy', 'pptx', 'PIL', 'lxml', 'streamlit']
+
+# Temps d'import maximal du coeur (s), par défaut de --budget-import
+BUDGET_IMPORT = 0.25
+
+# Écart absolu minimal (s) pour signaler une régression : évite le bruit
+# sur les étapes de quelques millisecondes
+ECART_MINIMAL = 0.005
+
+
+# --- Données synthétiques ---
+
+def placeholders_synthetiques(n):
+    """
+    Les placeholders texte par défaut, complétés par {{Champ_i}} jusqu'à n.
+    """
+    phs = {ph: col for ph, col in PLACEHOLDERS_DEFAULT.items() if ph != 'IMAGE_PROJET'}
+    phs = dict(list(phs.items())[:n])
+    for i in range(len(phs), n):
+        phs[f'{{{{Champ_{i}}}}}'] = f'champ {i}'
+    return phs
+
+
+def classeur_synthetique(n_lignes, placeholders, n_images, seed=0):
+    """
+    DataFrame de `n_lignes` projets (dtype str, comme à la lecture du classeur).
+    """
+    import pandas as pd
+
+    rnd = random.Random(seed)
+    villes = ['Marseille', 'Montpellier', 'Nîmes', 'Paris', 'Lyon', 'Avignon']
+    colonnes = {}
+    for ph, col in placeholders.items():
+        if ph == '{{Montant_Travaux}}':
+            colonnes[col] = [str(rnd.randrange(100000, 20000000)) for _ in range(n_lignes)]
+        elif ph == '{{Surface}}':
+            colonnes[col] = [str(rnd.randrange(100, 20000)) for _ in range(n_lignes)]
+        elif ph == '{{Ville}}':
+            colonnes[col] = [rnd.choice(villes) for _ in range(n_lignes)]
+        else:
+            colonnes[col] = [f'{col} {i} ' + 'texte ' * rnd.randrange(1, 30) for i in range(n_lignes)]
+    colonnes[PLACEHOLDERS_DEFAULT['IMAGE_PROJET']] = [f'{i % n_images + 1}.jpg' for i in range(n_lignes)]
+    for col in MAPPING_BLASONS:
+        colonnes[col] = ['x' if rnd.random() < 0.3 else None for _ in range(n_lignes)]
+    return pd.DataFrame(colonnes, dtype=str)
+
+
+def modele_synthetique(placeholders, runs):
+    """
+    Modèle PPTX d'une slide : une zone de texte par placeholder (découpé en
+    `runs` runs, un paragraphe sur trois précédé d'un libellé), une image
+    IMAGE_PROJET et un blason_centre. Renvoie les octets du fichier.
+    """
+    from pptx import Presentation
+    from pptx.util import Emu
+    from PIL import Image
+
+    prs = Presentation()
+    prs.slide_width, prs.slide_height = Emu(18288000), Emu(10287000)
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+
+    vignette = BytesIO()
+    Image.new('RGB', (400, 300), (200, 200, 200)).save(vignette, format='PNG')
+    pic = slide.shapes.add_picture(BytesIO(vignette.getvalue()), Emu(9000000), Emu(500000), Emu(8500000), Emu(6000000))
+    pic.name = 'IMAGE_PROJET'
+    pic = slide.shapes.add_picture(BytesIO(vignette.getvalue()), Emu(17000000), Emu(4500000), Emu(900000), Emu(900000))
+    pic.name = 'blason_centre'
+
+    hauteur = max(1, 9500000 // max(1, len(placeholders)))
+    for i, ph in enumerate(placeholders):
+        box = slide.shapes.add_textbox(Emu(300000), Emu(300000 + i * hauteur), Emu(8000000), Emu(hauteur))
+        para = box.text_frame.paragraphs[0]
+        if i % 3 == 0:
+            para.add_run().text = 'Libellé : '
+        nom = ph[2:-2]
+        morceaux = ['{{', nom, '}}'] if runs >= 3 else ([ph] if runs == 1 else ['{{' + nom, '}}'])
+        if runs > 3:
+            taille = max(1, len(nom) // (runs - 2))
+            morceaux = ['{{'] + [nom[j:j + taille] for j in range(0, len(nom), taille)] + ['}}']
+        for morceau in morceaux:
+            run = para.add_run()
+            run.text = morceau
+            run.font.bold = True
+
+    buf = BytesIO()
+    prs.save(buf)
+    return buf.getvalue()
+
+
+def assets_synthetiques(dossier, n_images):
+    """
+    Images projet (JPEG 1800x1200) et logos (PNG) dans `dossier`.
+    """
+    from PIL import Image
+
+    img_dir = os.path.join(dossier, 'img')
+    logos_dir = os.path.join(dossier, 'logos')
+    os.makedirs(img_dir, exist_ok=True)
+    os.makedirs(logos_dir, exist_ok=True)
+    for i in range(1, n_images + 1):
+        Image.effect_noise((1800, 1200), 40 + i).convert('RGB').save(os.path.join(img_dir, f'{i}.jpg'), quality=90)
+    for filename in MAPPING_BLASONS.values():
+        Image.new('RGBA', (300, 300), (30, 90, 160, 255)).save(os.path.join(logos_dir, filename))
+    return img_dir, logos_dir
+
+
+# --- Mesures ---
+
+class Chrono:
+    """
+    Cumule le temps (et, si tracemalloc est actif, le pic mémoire) par étape.
+    """
+
+    def __init__(self, memoire=False):
+        self.memoire = memoire
+        self.secondes = dict.fromkeys(ETAPES, 0.0)
+        self.pic = dict.fromkeys(ETAPES, 0)
+
+    def mesurer(self, etape, fonction, *args, **kwargs):
+        if self.memoire:
+            avant = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        debut = time.perf_counter()
+        resultat = fonction(*args, **kwargs)
+        self.secondes[etape] += time.perf_counter() - debut
+        if self.memoire:
+            self.pic[etape] = max(self.pic[etape], tracemalloc.get_traced_memory()[1] - avant)
+        return resultat
+
+
+def executer_pipeline(data_modele, df, mapping, img_dir, logos_dir, cache_dir, chrono):
+    """
+    Enchaîne les étapes de generate_presentation (mode clonage) en les
+    mesurant une à une.
+    """
+    from pptx import Presentation
+    from presentation_generator import (_remplir_blasons, _remplir_image, _remplir_textes,
+                                        _resoudre_mapping)
+    from utils.data_utils import preparer_valeurs
+    from utils.export_utils import ecrire_pptx
+    from utils.slide_utils import dupliquer_slide
+    from utils.template_utils import compiler_modele
+
+    prs = chrono.mesurer('chargement_modele', Presentation, BytesIO(data_modele))
+    index = chrono.mesurer('decouverte_placeholders', compiler_modele, prs)
+    valeurs = chrono.mesurer('plan_rendu', preparer_valeurs, df, mapping, TYPES_FORMATAGE)
+    lignes = df.to_dict('records')
+    index_slide = index['slides'][0]
+    plan = _resoudre_mapping(index_slide, mapping)
+    options_image = {'dpi': 150, 'qualite': 85, 'cache_dir': cache_dir}
+    source = prs.slides[0]
+    for projet, textes in zip(lignes, valeurs):
+        slide = chrono.mesurer('clonage', dupliquer_slide, prs, source)
+        shapes = list(slide.shapes)
+        chrono.mesurer('textes', _remplir_textes, shapes, textes, plan)
+        chrono.mesurer('images', _remplir_image, slide, shapes, textes, index_slide, img_dir, options_image)
+        chrono.mesurer('blasons', _remplir_blasons, slide, shapes, projet, index_slide, logos_dir, 'x')
+    chrono.mesurer('sauvegarde', ecrire_pptx, prs, BytesIO())
+
+
+def mesurer_import():
+    """
+    Temps d'import du coeur dans un processus neuf, et modules lourds chargés.
+    """
+    code = ('import sys, time; t = time.perf_counter(); import presentation_generator, batch; '
+            'd = time.perf_counter() - t; import json; '
+            f'print(json.dumps([d, [m for m in {MODULES_LOURDS!r} if m in sys.modules]]))')
+    sortie = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    secondes, modules = json.loads(sortie.stdout.strip().splitlines()[-1])
+    return {'secondes': secondes, 'modules_lourds': modules}
+
+
+def executer_scenario(n_lignes, n_placeholders, runs, dossier, memoire=True, exporter=None):
+    placeholders = placeholders_synthetiques(n_placeholders)
+    mapping = {**placeholders, 'IMAGE_PROJET': PLACEHOLDERS_DEFAULT['IMAGE_PROJET']}
+    img_dir, logos_dir = assets_synthetiques(dossier, n_images=5)
+    df = classeur_synthetique(n_lignes, placeholders, n_images=5)
+    data_modele = modele_synthetique(placeholders, runs)
+    if exporter:
+        os.makedirs(exporter, exist_ok=True)
+        df.to_excel(os.path.join(exporter, f'classeur_{n_lignes}.xlsx'), index=False, startrow=1)
+        with open(os.path.join(exporter, f'modele_{n_placeholders}x{runs}.pptx'), 'wb') as f:
+            f.write(data_modele)
+    cache_dir = os.path.join(dossier, 'cache')
+
+    # Passe de chauffe (cache images, imports), puis passe chronométrée
+    executer_pipeline(data_modele, df.head(5), mapping, img_dir, logos_dir, cache_dir, Chrono())
+    chrono = Chrono()
+    executer_pipeline(data_modele, df, mapping, img_dir, logos_dir, cache_dir, chrono)
+    resultat = {etape: {'secondes': round(chrono.secondes[etape], 6)} for etape in ETAPES}
+
+    if memoire:
+        chrono_mem = Chrono(memoire=True)
+        tracemalloc.start()
+        try:
+            executer_pipeline(data_modele, df, mapping, img_dir, logos_dir, cache_dir, chrono_mem)
+            total = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        for etape in ETAPES:
+            resultat[etape]['pic_mo'] = round(chrono_mem.pic[etape] / 2**20, 3)
+        resultat['total'] = {'secondes': round(sum(chrono.secondes.values()), 6),
+                             'pic_mo': round(total / 2**20, 3)}
+    else:
+        resultat['total'] = {'secondes': round(sum(chrono.secondes.values()), 6)}
+    return resultat
+
+
+# --- Baseline ---
+
+def comparer(resultats, baseline, seuil):
+    """
+    Liste des régressions (scénario, étape, base, nouveau) au-delà de `seuil`.
+    """
+    regressions = []
+    for scenario, etapes in resultats.items():
+        for etape, mesure in etapes.items():
+            base = baseline.get(scenario, {}).get(etape, {})
+            if 'secondes' in mesure and 'secondes' in base:
+                avant, apres = base['secondes'], mesure['secondes']
+                if apres > avant * (1 + seuil) and apres - avant > ECART_MINIMAL:
+                    regressions.append((scenario, etape, avant, apres))
+    return regressions
+
+
+def afficher(resultats):
+    for scenario, etapes in resultats.items():
+        print(f"\n{scenario}")
+        for etape, mesure in etapes.items():
+            if 'secondes' not in mesure:
+                continue
+            pic = f"{mesure['pic_mo']:>9.2f} Mo" if 'pic_mo' in mesure else ''
+            print(f"  {etape:<25} {mesure['secondes']:>9.4f}s {pic}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks de génération PPTX')
+    parser.add_argument('--tailles', type=int, nargs='+', default=[10, 100, 1000],
+                        help='nombres de lignes des classeurs synthétiques')
+    parser.add_argument('--modeles', nargs='+', default=['11x3'],
+                        help='modèles synthétiques NxK : N placeholders découpés en K runs')
+    parser.add_argument('--baseline', default='benchmark_baseline.json')
+    parser.add_argument('--enregistrer', action='store_true', help='écrit les résultats comme baseline')
+    parser.add_argument('--seuil', type=float, default=0.25,
+                        help='ralentissement relatif toléré avant échec (0.25 = +25%%)')
+    parser.add_argument('--budget-import', type=float, default=BUDGET_IMPORT,
+                        help="temps d'import maximal du coeur, en secondes")
+    parser.add_argument('--sans-memoire', action='store_true', help='ne mesure pas le pic mémoire')
+    parser.add_argument('--exporter', help='dossier où enregistrer classeurs et modèles synthétiques')
+    args = parser.parse_args(argv)
+
+    echec = False
+    resultats = {'import': {'import': mesurer_import()}}
+    imp = resultats['import']['import']
+    print(f"Import du coeur : {imp['secondes']:.3f}s, modules lourds chargés : {imp['modules_lourds'] or 'aucun'}")
+    if imp['modules_lourds'] or imp['secondes'] > args.budget_import:
+        print(f"ÉCHEC budget d'import ({args.budget_import}s, aucun module lourd)")
+        echec = True
+
+    with tempfile.TemporaryDirectory() as dossier:
+        for modele in args.modeles:
+            n_ph, runs = (int(x) for x in modele.lower().split('x'))
+            for taille in args.tailles:
+                scenario = f"{taille}_lignes_{n_ph}ph_{runs}runs"
+                resultats[scenario] = executer_scenario(taille, n_ph, runs, dossier,
+                                                        memoire=not args.sans_memoire,
+                                                        exporter=args.exporter)
+    afficher(resultats)
+
+    if args.enregistrer:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(resultats, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline enregistrée dans {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = comparer(resultats, baseline, args.seuil)
+        for scenario, etape, avant, apres in regressions:
+            print(f"RÉGRESSION {scenario} / {etape} : {avant:.4f}s -> {apres:.4f}s")
+        if regressions:
+            echec = True
+        else:
+            print(f"\nAucune régression au-delà de {args.seuil:.0%} par rapport à {args.baseline}")
+    return 1 if echec else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -34,4 +34,40 @@ TYPES_FORMATAGE = {
 }
 
 # Extensions d'images à rechercher
-IMAGE_EXTENSIONS = ['*.jpg', '*.jpeg', '*.png']
\ No newline at end of file
+IMAGE_EXTENSIONS = ['*.jpg', '*.jpeg', '*.png']
+
+# Dossier des caches persistants (index des modèles, ...)
+DOSSIER_CACHE = '.cache'
+
+# Réduction des images projet : résolution cible (None = image d'origine)
+# et qualité JPEG de réencodage
+IMAGE_DPI = 150
+IMAGE_QUALITE = 85
+
+# Niveau de compression deflate des parts XML du PPTX (0-9)
+NIVEAU_COMPRESSION_XML = 6
+
+# Préchargement des images projet pendant le rendu : threads de lecture
+# (0 = désactivé), nombre de lignes d'avance et octets gardés en mémoire
+PRECHARGEMENT_THREADS = 4
+PRECHARGEMENT_FENETRE = 16
+PRECHARGEMENT_MAX_OCTETS = 64 * 1024 * 1024
+
+# Rendu parallèle d'un deck (slides clonées) : nombre de processus
+# (1 = rendu séquentiel) et nombre maximal de lignes par lot envoyé
+PROCESSUS_RENDU = 1
+LIGNES_PAR_LOT = 50
+
+# Export par volumes : nombre de projets par PPTX
+TAILLE_VOLUME = 200
+
+# Service local de rendu (service.py) : adresse, nombre de workers et
+# nombre maximal de rendus en attente au-delà des workers occupés
+SERVICE_URL = 'http://127.0.0.1:8765'
+SERVICE_WORKERS = 2
+SERVICE_FILE_MAX = 16
+
+# Cache des decks générés (DOSSIER_CACHE/decks), partagé entre sessions et
+# processus : taille maximale sur disque, au-delà les decks les moins
+# récemment servis sont évincés
+CACHE_DECKS_MAX_OCTETS = 1024 * 1024 * 1024
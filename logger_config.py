@@ -8,7 +8,8 @@ def get_logger(name=__name__):
         fmt = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         handlers = [
             logging.StreamHandler(sys.stdout),
-            logging.FileHandler('powerpoint_generator.log', encoding='utf-8')
+            # delay : le fichier n'est ouvert qu'au premier message écrit
+            logging.FileHandler('powerpoint_generator.log', encoding='utf-8', delay=True)
         ]
         for h in handlers:
             h.setFormatter(logging.Formatter(fmt))
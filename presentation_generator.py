@@ -1,66 +1,828 @@
 # File: presentation_generator.py
 
+import gc
+import multiprocessing
 import os
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from io import BytesIO
-from pptx import Presentation
-from config import PLACEHOLDERS_DEFAULT, TYPES_FORMATAGE, MAPPING_BLASONS
+from config import TYPES_FORMATAGE, MAPPING_BLASONS, DOSSIER_CACHE, IMAGE_DPI, IMAGE_QUALITE, NIVEAU_COMPRESSION_XML, TAILLE_VOLUME
+from config import PRECHARGEMENT_THREADS, PRECHARGEMENT_FENETRE, PRECHARGEMENT_MAX_OCTETS, PROCESSUS_RENDU, LIGNES_PAR_LOT
+from config import CACHE_DECKS_MAX_OCTETS
 from logger_config import get_logger
-from utils.data_utils import convertir_en_numerique, formater_valeur
-from utils.text_utils import analyze_placeholders, find_placeholders_in_slide, normalize_placeholder, remplacer_placeholder
-from utils.image_utils import creer_image_transparente, remplacer_image
+from utils.data_utils import preparer_valeurs
+from utils.text_utils import normalize_placeholder, remplacer_placeholders_paragraphe
+from utils.image_utils import hash_source, remplacer_image
 from utils.blasons_utils import gerer_blasons_ameliore
+from utils.assets_utils import chercher_image_projet, images_projets, lire_logo, logos_blasons
+from utils.apercu_utils import LARGEUR_APERCU, dessiner_apercu, gabarit_modele
+from utils.template_utils import charger_index_modele, hash_contenu, lire_octets, resoudre_placeholder
+from utils.incremental_utils import RENDU_VERSION, charger_manifeste, ecrire_manifeste, empreinte_slide
+from utils.export_utils import ecrire_pptx
+from utils.cache_decks_utils import chercher_deck, cle_deck, stocker_deck
+from utils.prechargement_utils import Prechargeur
+from utils import pptx_xml_utils as pptx_xml
+from utils.instrumentation_utils import collecter, compter, enregistrer_slide, etape, fusionner
+from utils.slide_utils import (contexte_import, deplacer_dernieres_slides, dupliquer_slide, importer_slide,
+                               remplacer_slide, supprimer_slide)
 
 
-def generate_presentation(model_path, df, placeholders_mapping, img_dir, logos_dir, valeur_blason_active):
+def generate_presentation(model_path, df, placeholders_mapping, img_dir, logos_dir, valeur_blason_active,
+                          slides_prototypes=None, cache_dir=DOSSIER_CACHE,
+                          image_dpi=IMAGE_DPI, image_qualite=IMAGE_QUALITE,
+                          sortie=None, niveau_compression=NIVEAU_COMPRESSION_XML, incremental=False,
+                          rapport=None, profil_cpu=False, profil_memoire=False, moteur='pptx',
+                          progression=None, prechargement=PRECHARGEMENT_THREADS, processus=PROCESSUS_RENDU,
+                          simulation=False, cache_decks=True):
     """
     Génère une présentation PPTX en remplaçant placeholders, images et blasons,
     en appliquant le format monétaire pour {{Montant_Travaux}}.
+
+    Si `slides_prototypes` (indices 0-based) est fourni, ces slides servent de
+    modèles : elles sont clonées pour chaque ligne (en alternance) puis
+    remplacées par les clones, sans limite sur le nombre de projets.
+
+    Le modèle est compilé en un index des positions de placeholders, mis en
+    cache sous son hash dans `cache_dir` : le rendu ne fait plus de recherche.
+
+    Les images projet sont réduites à `image_dpi` (None pour les garder
+    intactes) et réencodées avec `image_qualite`, avec un cache disque.
+
+    Si `sortie` (chemin ou flux binaire) est fourni, le PPTX y est écrit
+    directement et `sortie` est renvoyé ; sinon un BytesIO est renvoyé.
+
+    En mode `incremental` (avec `sortie` chemin), un manifeste des empreintes
+    de chaque slide est écrit à côté du fichier ; à la génération suivante,
+    les slides dont l'empreinte n'a pas changé sont reprises du deck
+    précédent au lieu d'être régénérées.
+
+    Si `rapport` (dict) est fourni, il est rempli avec les mesures de la
+    génération : durées par étape et par slide, compteurs (placeholders,
+    images, blasons...) et, sur demande, profils cProfile / tracemalloc.
+
+    `moteur='xml'` utilise le moteur XML brut (utils/pptx_xml_utils) : le
+    modèle est traité comme une archive zip et les slides modifiées avec
+    lxml, sans python-pptx ; même contenu, pour les gros volumes. Le mode
+    incrémental reste assuré par le moteur python-pptx.
+
+    `progression`, si fourni, est appelé après chaque slide avec
+    (slides rendues, slides à rendre).
+
+    Les images projet (et les logos) des lignes à venir sont lues et réduites
+    en tâche de fond par `prechargement` threads pendant le remplissage des
+    slides (0 pour tout lire dans la boucle de rendu).
+
+    Avec `processus` > 1 et des slides prototypes, les lignes sont réparties
+    par lots sur un pool de processus qui rendent chacun leurs slides (moteur
+    XML) ; elles sont ensuite assemblées dans un seul paquet, dans l'ordre,
+    médias dédoublonnés. Même contenu que le rendu séquentiel.
+
+    Avec `simulation`, rien n'est rendu ni écrit : le plan de génération est
+    renvoyé (dict, voir _planifier), avec pour chaque slide placeholders
+    résolus ou absents, image projet, blasons actifs et taille estimée.
+
+    Avec `cache_decks` (et `cache_dir`), les decks générés sont gardés dans
+    `cache_dir`/decks sous l'empreinte de leurs entrées (modèle, lignes,
+    mapping, valeur blason, images et logos, options) : une demande
+    identique, de n'importe quelle session ou processus, recopie le deck
+    sans le générer. Pas de cache en mode incrémental ni avec un profil.
+    """
+    if simulation:
+        return _planifier(model_path, df, placeholders_mapping, img_dir, logos_dir, valeur_blason_active,
+                          slides_prototypes, cache_dir)
+    args = dict(
+        model_path=model_path, df=df, placeholders_mapping=placeholders_mapping, img_dir=img_dir,
+        logos_dir=logos_dir, valeur_blason_active=valeur_blason_active, slides_prototypes=slides_prototypes,
+        cache_dir=cache_dir, image_dpi=image_dpi, image_qualite=image_qualite, sortie=sortie,
+        niveau_compression=niveau_compression, incremental=incremental, progression=progression,
+        prechargement=prechargement,
+    )
+    generer = _generer
+    if moteur == 'xml' or processus > 1:
+        if incremental:
+            get_logger(__name__).warning("Mode incrémental non géré par le moteur XML : moteur python-pptx utilisé.")
+        else:
+            generer = _generer_xml
+            args['processus'] = processus
+    if cache_decks and cache_dir and not (incremental or profil_cpu or profil_memoire):
+        generer = partial(_generer_en_cache, generer)
+    if rapport is None and not (profil_cpu or profil_memoire):
+        return generer(**args)
+    with collecter(rapport, profil_cpu, profil_memoire):
+        return generer(**args)
+
+
+def exporter_volumes(model_path, df, placeholders_mapping, img_dir, logos_dir, valeur_blason_active,
+                     slides_prototypes, sortie, taille_volume=TAILLE_VOLUME, archive=False, progression=None,
+                     **options):
+    """
+    Export par volumes pour les très gros exports : les lignes de `df` sont
+    rendues par paquets de `taille_volume` projets, chaque volume dans son
+    propre PPTX, libéré avant le suivant. La mémoire crête dépend de la
+    taille d'un volume, pas du nombre total de lignes.
+
+    Sans `archive`, `sortie` est un chemin et les volumes sont écrits en
+    `{sortie sans .pptx}_001.pptx`, `_002`... ; avec `archive`, `sortie`
+    (chemin ou flux) reçoit un zip où chaque volume est écrit directement.
+    L'alternance des slides modèles continue d'un volume à l'autre ; sans
+    slides modèles, un seul volume est produit (le modèle borne le deck).
+
+    `progression(volumes faits, volumes)` est appelé après chaque volume ;
+    `options` est passé à generate_presentation (moteur, image_dpi...).
+    Renvoie les chemins (ou noms dans l'archive) des volumes.
     """
     logger = get_logger(__name__)
-    prs = Presentation(model_path)
-    # Image transparente pour blasons inactifs
-    creer_image_transparente()
+    data = lire_octets(model_path)
+    prototypes = list(slides_prototypes or [])
+    if not prototypes and len(df) > taille_volume:
+        logger.warning("Export par volumes sans slides modèles : un seul volume est produit.")
+        taille_volume = len(df)
+    taille_volume = max(1, taille_volume)
+    nombre = max(1, -(-len(df) // taille_volume))
+    base = os.path.splitext(os.path.basename(sortie) if isinstance(sortie, (str, os.PathLike)) else 'presentation')[0]
+
+    volumes = []
+    zf = zipfile.ZipFile(sortie, 'w', compression=zipfile.ZIP_STORED) if archive else None
+    try:
+        for k in range(nombre):
+            debut = time.perf_counter()
+            lignes = df.iloc[k * taille_volume:(k + 1) * taille_volume]
+            # Rotation : la 1re ligne du volume prend la slide modèle suivante
+            decalage = (k * taille_volume) % len(prototypes) if prototypes else 0
+            args = dict(model_path=BytesIO(data), df=lignes, placeholders_mapping=placeholders_mapping,
+                        img_dir=img_dir, logos_dir=logos_dir, valeur_blason_active=valeur_blason_active,
+                        slides_prototypes=prototypes[decalage:] + prototypes[:decalage] or None, **options)
+            if zf is not None:
+                nom = f"{base}_{k + 1:03d}.pptx"
+                with zf.open(nom, 'w') as flux:
+                    generate_presentation(sortie=flux, **args)
+            else:
+                nom = f"{os.path.splitext(sortie)[0]}_{k + 1:03d}.pptx"
+                generate_presentation(sortie=nom, **args)
+            volumes.append(nom)
+            # Les objets python-pptx forment des cycles : libération explicite
+            del args, lignes
+            gc.collect()
+            logger.info(f"Volume {k + 1}/{nombre} écrit ({nom}) en {time.perf_counter() - debut:.2f}s")
+            if progression:
+                progression(k + 1, nombre)
+    finally:
+        if zf is not None:
+            zf.close()
+    return volumes
+
+
+def generer_apercu(model_path, df, ligne, placeholders_mapping, img_dir, logos_dir, valeur_blason_active,
+                   slides_prototypes=None, cache_dir=DOSSIER_CACHE, largeur=LARGEUR_APERCU, format_image='PNG'):
+    """
+    Aperçu PNG ou JPEG (octets) de la slide de la ligne `ligne` (position dans `df`),
+    telle que generate_presentation la remplirait, sans générer le deck :
+    gabarit et index du modèle sont en cache, seule la slide est dessinée.
+    Renvoie None si la ligne n'a pas de slide (modèle sans prototype trop court).
+    """
+    data = lire_octets(model_path)
+    index = charger_index_modele(data, None, cache_dir)
+    prototypes = [i for i in slides_prototypes or [] if 0 <= i < len(index['slides'])]
+    i_slide = prototypes[ligne % len(prototypes)] if prototypes else ligne
+    if i_slide >= len(index['slides']):
+        return None
+    index_slide = index['slides'][i_slide]
+
+    df_ligne = df.iloc[[ligne]]
+    textes = preparer_valeurs(df_ligne, placeholders_mapping, TYPES_FORMATAGE)[0]
+    projet = df_ligne.to_dict('records')[0]
+    valeurs = {pos['texte']: textes[ph]
+               for ph, positions in _resoudre_mapping(index_slide, placeholders_mapping) for pos in positions}
+    image = chercher_image_projet(img_dir, textes['IMAGE_PROJET']) if 'IMAGE_PROJET' in textes else None
+    logos = [((logos_dir, filename), lire_logo(logos_dir, filename))
+             for col, filename in MAPPING_BLASONS.items()
+             if str(projet.get(col, '')).strip().lower() == valeur_blason_active.lower()
+             and lire_logo(logos_dir, filename) is not None]
+    return dessiner_apercu(gabarit_modele(data), i_slide, index_slide, valeurs, image, logos, largeur,
+                           format_image)
+
+
+def _planifier(model_path, df, placeholders_mapping, img_dir, logos_dir, valeur_blason_active,
+               slides_prototypes, cache_dir):
+    """
+    Plan de génération, sans rendu ni écriture (mode simulation) : pour
+    chaque slide à produire, placeholders résolus ou absents, valeurs vides,
+    image projet trouvée ou non, blasons actifs et octets ajoutés au deck.
+    Seuls l'index du modèle, le répertoire du zip et les dossiers d'images
+    et de logos sont lus. La taille estimée compte les images à leur taille
+    d'origine : c'est un majorant quand elles sont réduites (image_dpi).
+    """
+    debut = time.perf_counter()
+    data = lire_octets(model_path)
+    index = charger_index_modele(data, None, cache_dir)
+    tailles = pptx_xml.tailles_slides(data)
+    prototypes = [i for i in slides_prototypes or [] if 0 <= i < len(index['slides'])]
+    total = len(df) if prototypes else min(len(df), len(index['slides']))
+    valeurs = preparer_valeurs(df, placeholders_mapping, TYPES_FORMATAGE)
+
+    # Résolution du mapping, une fois par slide modèle
+    modeles = {}
+    for i in sorted(set(prototypes)) if prototypes else range(total):
+        index_slide = index['slides'][i]
+        plan = _resoudre_mapping(index_slide, placeholders_mapping)
+        mappees = [positions for _, positions in plan]
+        modeles[i] = {
+            'placeholders_resolus': [ph for ph, _ in plan],
+            'placeholders_manquants': _placeholders_manquants(plan, placeholders_mapping),
+            'placeholders_non_mappes': [ph for ph, positions in index_slide['placeholders'].items()
+                                        if not any(positions is p for p in mappees)],
+            'zone_image': index_slide['image_projet'] is not None,
+        }
 
+    # Blasons actifs, colonne par colonne
+    logos = logos_blasons(logos_dir)
+    actifs = []
+    for col, filename in MAPPING_BLASONS.items():
+        if col in df.columns:
+            masque = df[col].astype(str).str.strip().str.lower() == valeur_blason_active.lower()
+            actifs.append((filename, masque.tolist()))
+
+    images = images_projets(img_dir)
+    etiquettes = df.index.tolist()
+    position = min(prototypes) if prototypes else 0
+    # Médias déjà comptés : une image ou un logo n'est écrit qu'une fois par deck
+    vus = set()
+    slides = []
+    for idx in range(total):
+        i = prototypes[idx % len(prototypes)] if prototypes else idx
+        modele = modeles[i]
+        textes = valeurs[idx]
+        numero = textes.get('IMAGE_PROJET')
+        image = images.get(numero) if numero else None
+        blasons = [filename for filename, masque in actifs if masque[idx]]
+        medias = 0
+        if image and ('image', image) not in vus:
+            vus.add(('image', image))
+            try:
+                medias += os.stat(image).st_size
+            except OSError:
+                image = None
+        for filename in blasons:
+            if filename in logos and ('logo', filename) not in vus:
+                vus.add(('logo', filename))
+                medias += len(lire_logo(logos_dir, filename))
+        slides.append({
+            'position': position + idx,
+            'ligne': etiquettes[idx],
+            'slide_modele': i,
+            'placeholders_resolus': modele['placeholders_resolus'],
+            'placeholders_manquants': modele['placeholders_manquants'],
+            'valeurs_vides': [ph for ph in modele['placeholders_resolus'] if textes[ph] == ''],
+            'image': image,
+            'numero_image': numero,
+            'blasons': blasons,
+            'logos_manquants': [filename for filename in blasons if filename not in logos],
+            'octets_medias': medias,
+            # Une slide clonée ajoute son XML ; sans prototype, la slide est déjà dans le modèle
+            'octets': medias + (tailles[i] if prototypes else 0),
+        })
+
+    octets_medias = sum(s['octets_medias'] for s in slides)
+    return {
+        'slides': slides,
+        'modeles': modeles,
+        'lignes': len(df),
+        'lignes_sans_slide': len(df) - total,
+        'prototypes_hors_limites': [i for i in slides_prototypes or [] if i not in prototypes],
+        'colonnes_absentes': sorted({col for col in placeholders_mapping.values() if col and col not in df.columns}),
+        'colonnes_blasons_absentes': [col for col in MAPPING_BLASONS if col not in df.columns],
+        'images_manquantes': sorted({s['numero_image'] for s in slides if s['numero_image'] and not s['image']}),
+        'logos_manquants': sorted({filename for s in slides for filename in s['logos_manquants']}),
+        'octets_medias': octets_medias,
+        'taille_estimee': (len(data) - sum(tailles[i] for i in set(prototypes))
+                           + sum(s['octets'] for s in slides)),
+        'secondes': time.perf_counter() - debut,
+    }
+
+
+def _generer_en_cache(generer, **args):
+    """
+    Génération via le cache des decks : un deck déjà en cache est recopié
+    vers la sortie, sinon il est généré par `generer` puis mis en cache.
+    Une sortie flux reçoit le deck généré dans un fichier temporaire du
+    cache, puis déplacé dans le cache : pas de passage par la mémoire.
+    """
+    dossier = os.path.join(args['cache_dir'], 'decks')
+    sortie = args['sortie']
+    with etape('cache_decks'):
+        data = lire_octets(args['model_path'])
+        cle = cle_deck(data, args['df'], args['placeholders_mapping'], args['valeur_blason_active'],
+                       args['img_dir'], args['logos_dir'], MAPPING_BLASONS,
+                       slides_prototypes=args['slides_prototypes'], image_dpi=args['image_dpi'],
+                       image_qualite=args['image_qualite'], niveau_compression=args['niveau_compression'],
+                       formatage=TYPES_FORMATAGE)
+        chemin = chercher_deck(dossier, cle)
+        deck = None
+        if chemin is not None:
+            # Ouvert avant d'écrire quoi que ce soit : si le deck vient d'être
+            # évincé par un autre processus, la sortie est encore intacte
+            try:
+                deck = open(chemin, 'rb')
+            except OSError as e:
+                get_logger(__name__).warning(f"Deck en cache illisible ({e}) : génération.")
+    if deck is not None:
+        with etape('cache_decks'), deck:
+            resultat = _copier_deck(deck, sortie)
+        compter('decks_en_cache')
+        if args['progression']:
+            args['progression'](len(args['df']), len(args['df']))
+        return resultat
+
+    args['model_path'] = BytesIO(data)
+    if isinstance(sortie, (str, os.PathLike)):
+        generer(**args)
+        with etape('cache_decks'):
+            stocker_deck(dossier, cle, sortie, CACHE_DECKS_MAX_OCTETS)
+        return sortie
+    if sortie is None:
+        buf = generer(**args)
+        with etape('cache_decks'), buf.getbuffer() as octets:
+            stocker_deck(dossier, cle, octets, CACHE_DECKS_MAX_OCTETS)
+        return buf
+    os.makedirs(dossier, exist_ok=True)
+    tmp = os.path.join(dossier, f"{cle}.{os.getpid()}-{threading.get_ident()}.rendu")
+    try:
+        generer(**dict(args, sortie=tmp))
+        with etape('cache_decks'):
+            with open(tmp, 'rb') as f:
+                shutil.copyfileobj(f, sortie)
+            stocker_deck(dossier, cle, tmp, CACHE_DECKS_MAX_OCTETS, deplacer=True)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return sortie
+
+
+def _copier_deck(deck, sortie):
+    """
+    Recopie le deck en cache (fichier ouvert) vers la sortie.
+    """
+    if sortie is None:
+        return BytesIO(deck.read())
+    if isinstance(sortie, (str, os.PathLike)):
+        with open(sortie, 'wb') as f:
+            shutil.copyfileobj(deck, f)
+        return sortie
+    shutil.copyfileobj(deck, sortie)
+    return sortie
+
+
+def _generer(model_path, df, placeholders_mapping, img_dir, logos_dir, valeur_blason_active,
+             slides_prototypes, cache_dir, image_dpi, image_qualite, sortie, niveau_compression, incremental,
+             progression=None, prechargement=0):
+    from pptx import Presentation
+
+    logger = get_logger(__name__)
+    with etape('chargement_modele'):
+        data = lire_octets(model_path)
+        prs = Presentation(BytesIO(data))
+    with etape('index_modele'):
+        index = charger_index_modele(data, prs, cache_dir)
     # Réinitialiser l'index pour faire correspondre séquentiellement les slides filtrées
     df = df.reset_index(drop=True)
+    # Plan de rendu : textes formatés calculés colonne par colonne
+    with etape('plan_rendu'):
+        valeurs = preparer_valeurs(df, placeholders_mapping, TYPES_FORMATAGE)
+        lignes = df.to_dict('records')
+
+    options_image = {
+        'dpi': image_dpi,
+        'qualite': image_qualite,
+        'cache_dir': os.path.join(cache_dir, 'images') if cache_dir else None,
+    }
+
+    # Slides reprises de la génération précédente, par empreinte
+    incremental = incremental and isinstance(sortie, (str, os.PathLike))
+    anciennes = {}
+    contexte = None
+    if incremental:
+        cle_modele = hash_contenu(data)
+        precedent = charger_manifeste(sortie)
+        if precedent:
+            with etape('chargement_precedent'):
+                slides_prec = list(Presentation(sortie).slides)
+            anciennes = {h: slides_prec[int(pos)] for pos, h in precedent['slides'].items()
+                         if h and int(pos) < len(slides_prec)}
+        contexte = contexte_import(prs)
+    manifeste = {'version': RENDU_VERSION, 'slides': {}}
+    reprises = 0
+
+    def empreinte(i_modele, idx):
+        if not incremental:
+            return None
+        projet = lignes[idx]
+        with etape('empreintes'):
+            path = chercher_image_projet(img_dir, valeurs[idx].get('IMAGE_PROJET', ''))
+            return empreinte_slide(
+                modele=cle_modele, slide_modele=i_modele, mapping=placeholders_mapping,
+                textes=valeurs[idx], image=(path, hash_source(path)) if path else None,
+                options_image=[image_dpi, image_qualite], logos_dir=logos_dir,
+                blasons=[str(projet.get(col, '')) for col in MAPPING_BLASONS],
+                valeur_blason=valeur_blason_active,
+            )
+
+    # Résolution du mapping, une seule fois par slide modèle
+    plans = {}
+    manquants = {}
+
+    def plan_slide(i):
+        if i not in plans:
+            plans[i] = _resoudre_mapping(index['slides'][i], placeholders_mapping)
+            manquants[i] = _placeholders_manquants(plans[i], placeholders_mapping)
+            if manquants[i]:
+                logger.debug(f"Slide modèle {i} : placeholders absents {manquants[i]}")
+        compter('placeholders_manquants', len(manquants[i]))
+        return plans[i]
+
+    prototypes = []
+    for i in slides_prototypes or []:
+        if 0 <= i < len(prs.slides):
+            prototypes.append(i)
+        else:
+            logger.warning(f"Slide prototype {i} hors limites, ignorée.")
+
+    total = len(lignes) if prototypes else min(len(lignes), len(prs.slides))
+    # Pas de préchargement si des slides sont reprises : leurs images ne seraient pas consommées
+    prechargeur = None
+    if prechargement and not anciennes:
+        prechargeur = _prechargeur(prechargement, index, valeurs, prototypes, total, img_dir, logos_dir,
+                                   options_image, lambda i, j: _taille(list(prs.slides[i].shapes)[j]))
+    if prototypes:
+        sources = [prs.slides[i] for i in prototypes]
+        position = min(prototypes)
+        for idx, projet in enumerate(lignes):
+            debut = time.perf_counter()
+            n = idx % len(prototypes)
+            h = empreinte(prototypes[n], idx)
+            reprise = _importer(prs, anciennes, h, contexte)
+            if reprise is not None:
+                reprises += 1
+            else:
+                with etape('clonage'):
+                    slide = dupliquer_slide(prs, sources[n])
+                _remplir_slide(slide, projet, valeurs[idx], index['slides'][prototypes[n]], plan_slide(prototypes[n]),
+                               img_dir, logos_dir, valeur_blason_active, options_image,
+                               prechargeur.prendre(idx) if prechargeur else None)
+            manifeste['slides'][str(position + idx)] = h
+            enregistrer_slide(position + idx, debut, slide_modele=prototypes[n], reprise=reprise is not None)
+            if progression:
+                progression(idx + 1, total)
+        with etape('reorganisation'):
+            for proto in sources:
+                supprimer_slide(prs, proto)
+            deplacer_dernieres_slides(prs, len(df), position)
+    else:
+        for idx, projet in enumerate(lignes):
+            if idx >= len(prs.slides):
+                break
+            debut = time.perf_counter()
+            h = empreinte(idx, idx)
+            reprise = _importer(prs, anciennes, h, contexte)
+            if reprise is not None:
+                remplacer_slide(prs, prs.slides[idx], reprise)
+                reprises += 1
+            else:
+                _remplir_slide(prs.slides[idx], projet, valeurs[idx], index['slides'][idx], plan_slide(idx),
+                               img_dir, logos_dir, valeur_blason_active, options_image,
+                               prechargeur.prendre(idx) if prechargeur else None)
+            manifeste['slides'][str(idx)] = h
+            enregistrer_slide(idx, debut, slide_modele=idx, reprise=reprise is not None)
+            if progression:
+                progression(idx + 1, total)
+    if prechargeur:
+        prechargeur.fermer()
+
+    compter('slides_generees', len(manifeste['slides']) - reprises)
+    compter('slides_reprises', reprises)
+    if incremental:
+        logger.info(f"Incrémental : {reprises}/{len(manifeste['slides'])} slide(s) reprise(s)")
+
+    # Sauvegarde : écriture directe vers la sortie, médias non recompressés
+    with etape('sauvegarde'):
+        if sortie is not None:
+            ecrire_pptx(prs, sortie, niveau_compression)
+            if incremental:
+                ecrire_manifeste(sortie, manifeste)
+            return sortie
+        buf = BytesIO()
+        ecrire_pptx(prs, buf, niveau_compression)
+        buf.seek(0)
+        return buf
+
+
+def _generer_xml(model_path, df, placeholders_mapping, img_dir, logos_dir, valeur_blason_active,
+                 slides_prototypes, cache_dir, image_dpi, image_qualite, sortie, niveau_compression, incremental,
+                 progression=None, prechargement=0, processus=1):
+    """
+    Même génération que _generer, sur le XML des slides (moteur XML brut).
+    """
+    logger = get_logger(__name__)
+    with etape('chargement_modele'):
+        data = lire_octets(model_path)
+        paquet = pptx_xml.ouvrir_paquet(data)
+        noms_slides = pptx_xml.slides(paquet)
+    with etape('index_modele'):
+        index = charger_index_modele(data, None, cache_dir)
+
+    df = df.reset_index(drop=True)
+    with etape('plan_rendu'):
+        valeurs = preparer_valeurs(df, placeholders_mapping, TYPES_FORMATAGE)
+        lignes = df.to_dict('records')
+
+    options_image = {
+        'dpi': image_dpi,
+        'qualite': image_qualite,
+        'cache_dir': os.path.join(cache_dir, 'images') if cache_dir else None,
+    }
+    plans = {}
+
+    def plan_slide(i):
+        if i not in plans:
+            plans[i] = _resoudre_mapping(index['slides'][i], placeholders_mapping)
+        compter('placeholders_manquants', len(_placeholders_manquants(plans[i], placeholders_mapping)))
+        return plans[i]
+
+    prototypes = []
+    for i in slides_prototypes or []:
+        if 0 <= i < len(noms_slides):
+            prototypes.append(i)
+        else:
+            logger.warning(f"Slide prototype {i} hors limites, ignorée.")
+
+    total = len(lignes) if prototypes else min(len(lignes), len(noms_slides))
+    # Un seul lot : rien à répartir, le démarrage des processus coûterait plus qu'il ne rapporte
+    parallele = prototypes and processus > 1 and len(lignes) > LIGNES_PAR_LOT
+    prechargeur = None
+    if prechargement and not parallele:
+        prechargeur = _prechargeur(prechargement, index, valeurs, prototypes, total, img_dir, logos_dir,
+                                   options_image, _taille_image_xml(paquet, noms_slides))
+    if prototypes:
+        position = min(prototypes)
+        if parallele:
+            _rendu_parallele(paquet, data, index, prototypes, lignes, valeurs, processus, progression,
+                             placeholders_mapping=placeholders_mapping, img_dir=img_dir, logos_dir=logos_dir,
+                             valeur_blason_active=valeur_blason_active, options_image=options_image,
+                             prechargement=prechargement)
+        else:
+            for idx, projet in enumerate(lignes):
+                debut = time.perf_counter()
+                n = idx % len(prototypes)
+                with etape('clonage'):
+                    partname = pptx_xml.cloner_slide(paquet, noms_slides[prototypes[n]])
+                _remplir_slide_xml(paquet, partname, projet, valeurs[idx], index['slides'][prototypes[n]],
+                                   plan_slide(prototypes[n]), img_dir, logos_dir, valeur_blason_active,
+                                   options_image, prechargeur.prendre(idx) if prechargeur else None)
+                enregistrer_slide(position + idx, debut, slide_modele=prototypes[n], reprise=False)
+                if progression:
+                    progression(idx + 1, total)
+        with etape('reorganisation'):
+            for i in prototypes:
+                pptx_xml.supprimer_slide(paquet, noms_slides[i])
+            pptx_xml.deplacer_dernieres_slides(paquet, len(df), position)
+    else:
+        for idx, projet in enumerate(lignes[:len(noms_slides)]):
+            debut = time.perf_counter()
+            _remplir_slide_xml(paquet, noms_slides[idx], projet, valeurs[idx], index['slides'][idx],
+                               plan_slide(idx), img_dir, logos_dir, valeur_blason_active, options_image,
+                               prechargeur.prendre(idx) if prechargeur else None)
+            enregistrer_slide(idx, debut, slide_modele=idx, reprise=False)
+            if progression:
+                progression(idx + 1, total)
+    if prechargeur:
+        prechargeur.fermer()
+    compter('slides_generees', total)
+
+    with etape('sauvegarde'):
+        if sortie is not None:
+            return pptx_xml.ecrire_paquet(paquet, sortie, niveau_compression)
+        buf = BytesIO()
+        pptx_xml.ecrire_paquet(paquet, buf, niveau_compression)
+        buf.seek(0)
+        return buf
+
+
+def _remplir_slide_xml(paquet, partname, projet, textes, index_slide, plan, img_dir, logos_dir,
+                       valeur_blason_active, options_image, image=None):
+    """
+    Remplit le XML d'une slide (texte, image, blasons), comme _remplir_slide.
+    """
+    elements = pptx_xml.formes(pptx_xml.xml_part(paquet, partname))
+    with etape('textes'):
+        pptx_xml.remplir_textes_xml(elements, textes, plan)
+    with etape('images'):
+        if 'IMAGE_PROJET' in textes:
+            cible = elements[index_slide['image_projet']] if index_slide['image_projet'] is not None else None
+            path = chercher_image_projet(img_dir, textes['IMAGE_PROJET'])
+            if path:
+                pptx_xml.remplacer_image_xml(paquet, partname, elements, cible, path, image=image, **options_image)
+    with etape('blasons'):
+        centre = elements[index_slide['blason_centre']] if index_slide['blason_centre'] is not None else None
+        pptx_xml.placer_blasons_xml(paquet, partname, centre, projet, MAPPING_BLASONS, logos_dir, valeur_blason_active)
+
+
+def _rendu_parallele(paquet, data, index, prototypes, lignes, valeurs, processus, progression, **params):
+    """
+    Rend les clones des `lignes` par lots de LIGNES_PAR_LOT au plus, sur
+    `processus` processus (voir _rendre_lot), puis les importe dans `paquet`
+    dans l'ordre des lignes, au fur et à mesure que les lots se terminent.
+    """
+    taille = max(1, min(LIGNES_PAR_LOT, -(-len(lignes) // processus)))
+    debuts = range(0, len(lignes), taille)
+    faites = 0
+    with ProcessPoolExecutor(max_workers=min(processus, len(debuts)), mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_lots, initargs=(data, index, prototypes, params)) as pool:
+        lots = [pool.submit(_rendre_lot, debut, lignes[debut:debut + taille], valeurs[debut:debut + taille])
+                for debut in debuts]
+        for lot in lots:
+            with etape('rendu_parallele'):
+                rendues, medias, mesures = lot.result()
+            # Les octets des médias sont comptés à l'import, une fois par deck
+            fusionner(mesures, sauf=('images_octets',))
+            with etape('assemblage'):
+                for octets, rels in rendues:
+                    pptx_xml.importer_slide_rendue(paquet, octets, rels, medias)
+            faites += len(rendues)
+            if progression:
+                progression(faites, len(lignes))
+
+
+# État d'un processus du rendu parallèle : modèle, index et paramètres du rendu
+_LOT = {}
+
+
+def _init_lots(data, index, prototypes, params):
+    _LOT.update(data=data, index=index, prototypes=prototypes, **params)
+
+
+def _rendre_lot(debut, lignes, valeurs):
+    """
+    Rendu d'un lot dans un processus du pool : les lignes `debut`, `debut + 1`...
+    sont clonées et remplies dans une copie du modèle.
+    Renvoie ([(XML, relations) par slide], médias créés {part: octets}, mesures).
+    """
+    mesures = {}
+    with collecter(mesures):
+        paquet = pptx_xml.ouvrir_paquet(_LOT['data'])
+        noms_slides = pptx_xml.slides(paquet)
+        membres_modele = set(paquet['membres'])
+        index = _LOT['index']
+        mapping = _LOT['placeholders_mapping']
+        options_image = _LOT['options_image']
+        # Prototypes décalés : la ligne `debut` reprend l'alternance du deck complet
+        decalage = debut % len(_LOT['prototypes'])
+        prototypes = _LOT['prototypes'][decalage:] + _LOT['prototypes'][:decalage]
+        position = min(prototypes) + debut
+        plans = {}
+        prechargeur = None
+        if _LOT['prechargement']:
+            prechargeur = _prechargeur(_LOT['prechargement'], index, valeurs, prototypes, len(lignes),
+                                       _LOT['img_dir'], _LOT['logos_dir'], options_image,
+                                       _taille_image_xml(paquet, noms_slides))
+        partnames = []
+        for idx, projet in enumerate(lignes):
+            debut_slide = time.perf_counter()
+            i = prototypes[idx % len(prototypes)]
+            if i not in plans:
+                plans[i] = _resoudre_mapping(index['slides'][i], mapping)
+            compter('placeholders_manquants', len(_placeholders_manquants(plans[i], mapping)))
+            with etape('clonage'):
+                partname = pptx_xml.cloner_slide(paquet, noms_slides[i])
+            _remplir_slide_xml(paquet, partname, projet, valeurs[idx], index['slides'][i], plans[i],
+                               _LOT['img_dir'], _LOT['logos_dir'], _LOT['valeur_blason_active'], options_image,
+                               prechargeur.prendre(idx) if prechargeur else None)
+            enregistrer_slide(position + idx, debut_slide, slide_modele=i, reprise=False)
+            partnames.append(partname)
+        if prechargeur:
+            prechargeur.fermer()
+        with etape('export_lot'):
+            rendues = [pptx_xml.exporter_slide(paquet, partname) for partname in partnames]
+            medias = {nom: octets for nom, octets in paquet['membres'].items() if nom not in membres_modele}
+    return rendues, medias, mesures
+
+
+def _prechargeur(threads, index, valeurs, prototypes, total, img_dir, logos_dir, options_image, taille_image):
+    """
+    Prechargeur des images projet des `total` slides à rendre.
+    `taille_image(i, j)` donne (largeur, hauteur) de la shape j de la slide
+    modèle i, la zone dans laquelle l'image est réduite.
+    """
+    tailles = {}
+    taches = []
+    for idx in range(total):
+        i = prototypes[idx % len(prototypes)] if prototypes else idx
+        if i not in tailles:
+            j = index['slides'][i]['image_projet']
+            tailles[i] = taille_image(i, j) if j is not None else None
+        path = images_projets(img_dir).get(valeurs[idx]['IMAGE_PROJET']) if 'IMAGE_PROJET' in valeurs[idx] else None
+        taches.append((path, *tailles[i]) if path and tailles[i] else None)
+    return Prechargeur(taches, options_image, threads, PRECHARGEMENT_FENETRE, PRECHARGEMENT_MAX_OCTETS,
+                       logos=(logos_dir, sorted(set(MAPPING_BLASONS.values()))))
+
+
+def _taille(shape):
+    return shape.width, shape.height
 
-    for idx, projet in df.iterrows():
-        if idx >= len(prs.slides):
-            break
-        slide = prs.slides[idx]
-        slide_phs = find_placeholders_in_slide(slide)
-
-        # Remplacement des placeholders texte
-        for ph, col in placeholders_mapping.items():
-            if not col:
-                continue
-            norm = normalize_placeholder(ph)
-            actual = slide_phs.get(norm) or next((v for k, v in slide_phs.items() if k.lower() == norm.lower()), None)
-            if not actual:
-                continue
-
-            val = projet.get(col, '')
-            val = convertir_en_numerique(val)
-            # Utilisation du mapping TYPES_FORMATAGE basé sur la clé originale ph
-            type_format = TYPES_FORMATAGE.get(ph)
-            fmt = formater_valeur(val, type_format)
-            remplacer_placeholder(slide, actual, fmt)
-
-        # Remplacement de l'image projet
-        img_col = placeholders_mapping.get('IMAGE_PROJET')
-        if img_col:
-            num = ''.join(filter(str.isdigit, str(projet.get(img_col, ''))))
-            for ext in ['png', 'jpg', 'jpeg']:
-                path = os.path.join(img_dir, f"{num}.{ext}")
-                if os.path.exists(path):
-                    remplacer_image(slide, 'IMAGE_PROJET', path)
-                    break
-
-        # Gestion des blasons
-        gerer_blasons_ameliore(slide, projet, MAPPING_BLASONS, logos_dir, valeur_blason_active)
-
-    # Sauvegarde
-    buf = BytesIO()
-    prs.save(buf)
-    buf.seek(0)
-    return buf
+
+def _taille_image_xml(paquet, noms_slides):
+    def taille_image(i, j):
+        boite = pptx_xml.geometrie(pptx_xml.formes(pptx_xml.xml_part(paquet, noms_slides[i]))[j])
+        return boite[2:] if boite else None
+    return taille_image
+
+
+def _importer(prs, anciennes, h, contexte):
+    """
+    Importe la slide d'empreinte `h` du deck précédent, ou None.
+    """
+    if h not in anciennes:
+        return None
+    with etape('import_slides'):
+        return importer_slide(prs, anciennes[h], contexte)
+
+
+def _resoudre_mapping(index_slide, placeholders_mapping):
+    """
+    Associe chaque placeholder mappé à ses positions dans la slide modèle.
+    Renvoie une liste de (placeholder, positions).
+    """
+    plan = []
+    for ph, col in placeholders_mapping.items():
+        if not col:
+            continue
+        positions = resoudre_placeholder(index_slide, normalize_placeholder(ph))
+        if positions:
+            plan.append((ph, positions))
+    return plan
+
+
+def _placeholders_manquants(plan, placeholders_mapping):
+    """
+    Placeholders texte mappés sur une colonne mais absents de la slide modèle.
+    """
+    trouves = {ph for ph, _ in plan}
+    return [ph for ph, col in placeholders_mapping.items()
+            if col and ph != 'IMAGE_PROJET' and ph not in trouves]
+
+
+def _remplir_slide(slide, projet, textes, index_slide, plan, img_dir, logos_dir, valeur_blason_active,
+                   options_image, image=None):
+    """
+    Remplit une slide avec les données d'un projet (texte, image, blasons),
+    en utilisant les positions de l'index modèle et les textes déjà
+    formatés du plan de rendu. `image` : image projet préchargée, s'il y a lieu.
+    """
+    # Instantané des shapes : les indices de l'index restent valides
+    # même après suppression/ajout d'images
+    shapes = list(slide.shapes)
+    with etape('textes'):
+        _remplir_textes(shapes, textes, plan)
+    with etape('images'):
+        _remplir_image(slide, shapes, textes, index_slide, img_dir, options_image, image)
+    with etape('blasons'):
+        _remplir_blasons(slide, shapes, projet, index_slide, logos_dir, valeur_blason_active)
+
+
+def _remplir_textes(shapes, textes, plan):
+    """
+    Remplacement des placeholders texte : valeurs regroupées par paragraphe,
+    chaque paragraphe n'est réécrit qu'une fois.
+    """
+    par_paragraphe = {}
+    for ph, positions in plan:
+        for pos in positions:
+            par_paragraphe.setdefault((pos['shape'], pos['paragraphe']), {})[pos['texte']] = textes[ph]
+    remplaces = 0
+    for (s_idx, p_idx), valeurs in par_paragraphe.items():
+        para = shapes[s_idx].text_frame.paragraphs[p_idx]
+        remplaces += remplacer_placeholders_paragraphe(para, valeurs)
+    compter('placeholders_trouves', sum(len(positions) for _, positions in plan))
+    compter('placeholders_remplaces', remplaces)
+
+
+def _remplir_image(slide, shapes, textes, index_slide, img_dir, options_image, image=None):
+    """
+    Remplacement de l'image projet.
+    """
+    if 'IMAGE_PROJET' not in textes:
+        return
+    cible = shapes[index_slide['image_projet']] if index_slide['image_projet'] is not None else None
+    path = chercher_image_projet(img_dir, textes['IMAGE_PROJET'])
+    if path:
+        remplacer_image(slide, 'IMAGE_PROJET', path, cible=cible, image=image, **options_image)
+
+
+def _remplir_blasons(slide, shapes, projet, index_slide, logos_dir, valeur_blason_active):
+    """
+    Gestion des blasons.
+    """
+    centre = shapes[index_slide['blason_centre']] if index_slide['blason_centre'] is not None else None
+    gerer_blasons_ameliore(slide, projet, MAPPING_BLASONS, logos_dir, valeur_blason_active, centre=centre)
@@ -0,0 +1,416 @@
+# File: service.py
+
+"""
+Service local de rendu PPTX.
+
+Usage : python service.py [--port 8765] [--workers N] [--file-max N]
+
+Les rendus tournent dans un pool de processus dont chaque worker garde en
+mémoire les modèles déjà vus (octets + index compilé) et l'index des
+dossiers d'images / blasons : l'interface Streamlit soumet un rendu et
+suit sa progression sans bloquer les autres sessions.
+
+API (JSON sauf mention contraire) :
+
+    GET    /sante                -> {"workers", "en_cours", "en_attente", "cache_decks"}
+    POST   /modeles              corps : octets du PPTX -> {"modele": hash}
+    GET    /modeles/<hash>       -> 200 si le modèle est connu, 404 sinon
+    POST   /rendus               -> 202 {"rendu": id} ; 503 si la file est pleine
+    GET    /rendus/<id>          -> {"etat", "position", "faites", "total", ...}
+    GET    /rendus/<id>/pptx     -> le PPTX (flux binaire) une fois terminé
+    DELETE /rendus/<id>          -> supprime le rendu et son fichier
+
+Corps de POST /rendus :
+
+{
+    "modele": "<hash renvoyé par POST /modeles>",
+    "lignes": <DataFrame.to_json(orient='table')>,
+    "mapping": {"{{Ville}}": "Ville", ...},
+    "img_dir": "img", "logos_dir": "logos", "valeur_blason": "x",
+    "slides_prototypes": [0], "image_dpi": 150, "moteur": "pptx",
+    "rapport": false
+}
+
+États d'un rendu : en_attente, en_cours, termine, echec.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from urllib.parse import urlsplit
+
+from config import DOSSIER_CACHE, IMAGE_DPI, SERVICE_FILE_MAX, SERVICE_URL, SERVICE_WORKERS
+from logger_config import get_logger
+from utils.cache_decks_utils import statistiques_decks
+from utils.template_utils import hash_contenu
+
+# Fichiers du service : modèles reçus et PPTX rendus
+DOSSIER_SERVICE = os.path.join(DOSSIER_CACHE, 'service')
+
+# Durée de conservation d'un rendu terminé non supprimé (secondes)
+CONSERVATION_RENDUS = 3600
+
+# Taille des blocs envoyés lors du téléchargement d'un PPTX
+TAILLE_BLOC = 1 << 20
+
+# Empreinte SHA-256 d'un modèle (nom de fichier sûr)
+_MOTIF_CLE = re.compile(r'^[0-9a-f]{64}$')
+
+# État de chaque worker : modèles chargés et file de progression
+_MODELES = {}
+_PROGRES = None
+
+
+def chemin_modele(cle):
+    return os.path.join(DOSSIER_SERVICE, 'modeles', f"{cle}.pptx")
+
+
+def _init_worker(progres, img_dir, logos_dir):
+    """
+    Préchauffe un worker : imports lourds, modèles déjà reçus et index
+    des dossiers d'assets par défaut.
+    """
+    global _PROGRES
+    _PROGRES = progres
+    import presentation_generator  # noqa: F401 (pandas, python-pptx, lxml)
+    from utils.assets_utils import images_projets, logos_blasons
+
+    dossier = os.path.dirname(chemin_modele('x'))
+    if os.path.isdir(dossier):
+        for nom in os.listdir(dossier):
+            if nom.endswith('.pptx'):
+                _modele(nom[:-len('.pptx')])
+    if os.path.isdir(img_dir):
+        images_projets(img_dir)
+    if os.path.isdir(logos_dir):
+        logos_blasons(logos_dir)
+
+
+def _pret():
+    return os.getpid()
+
+
+def _modele(cle):
+    """
+    Octets d'un modèle, lus une fois par worker ; son index compilé est
+    chargé en mémoire au passage.
+    """
+    if cle not in _MODELES:
+        from utils.template_utils import charger_index_modele
+        with open(chemin_modele(cle), 'rb') as f:
+            data = f.read()
+        charger_index_modele(data, None, DOSSIER_CACHE)
+        _MODELES[cle] = data
+    return _MODELES[cle]
+
+
+def executer_rendu(rendu_id, params, lignes, sortie):
+    """
+    Génère un rendu dans un worker, en publiant sa progression.
+    Renvoie le rapport de génération (None si non demandé).
+    """
+    import pandas as pd
+    from presentation_generator import generate_presentation
+
+    df = pd.read_json(StringIO(lignes), orient='table')
+    _PROGRES.put((rendu_id, 0, None))
+    rapport = {} if params.get('rapport') else None
+    generate_presentation(
+        model_path=BytesIO(_modele(params['modele'])),
+        df=df,
+        placeholders_mapping=params.get('mapping') or {},
+        img_dir=params.get('img_dir', 'img'),
+        logos_dir=params.get('logos_dir', 'logos'),
+        valeur_blason_active=params.get('valeur_blason', 'x'),
+        slides_prototypes=params.get('slides_prototypes'),
+        image_dpi=params.get('image_dpi', IMAGE_DPI),
+        sortie=sortie,
+        rapport=rapport,
+        moteur=params.get('moteur', 'pptx'),
+        progression=lambda faites, total: _PROGRES.put((rendu_id, faites, total)),
+    )
+    return rapport
+
+
+class ServiceRendu:
+    """
+    File des rendus : pool de processus borné, suivi de l'état de chaque
+    rendu et nettoyage des rendus expirés.
+    """
+
+    def __init__(self, workers=SERVICE_WORKERS, file_max=SERVICE_FILE_MAX, img_dir='img', logos_dir='logos'):
+        self.logger = get_logger(__name__)
+        self.workers = workers
+        self.file_max = file_max
+        self.rendus = {}
+        self.verrou = threading.Lock()
+        os.makedirs(os.path.dirname(chemin_modele('x')), exist_ok=True)
+        os.makedirs(os.path.join(DOSSIER_SERVICE, 'rendus'), exist_ok=True)
+        # spawn : pas de fork d'un processus qui a déjà des threads
+        self.contexte = multiprocessing.get_context('spawn')
+        self.progres = self.contexte.Queue()
+        self.initargs = (self.progres, img_dir, logos_dir)
+        self.pool = self._nouveau_pool()
+        threading.Thread(target=self._suivre_progres, daemon=True).start()
+
+    def _nouveau_pool(self):
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self.contexte,
+                                   initializer=_init_worker, initargs=self.initargs)
+        # Démarrage immédiat de tous les workers (préchauffage avant le 1er rendu)
+        for _ in range(self.workers):
+            pool.submit(_pret)
+        return pool
+
+    def _suivre_progres(self):
+        while True:
+            rendu_id, faites, total = self.progres.get()
+            with self.verrou:
+                rendu = self.rendus.get(rendu_id)
+                if rendu is None or rendu['etat'] not in ('en_attente', 'en_cours'):
+                    continue
+                rendu['etat'] = 'en_cours'
+                rendu['faites'] = faites
+                if total is not None:
+                    rendu['total'] = total
+
+    def enregistrer_modele(self, data):
+        cle = hash_contenu(data)
+        chemin = chemin_modele(cle)
+        if not os.path.exists(chemin):
+            tmp = f"{chemin}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, chemin)
+            self.logger.info(f"Modèle {cle} enregistré ({len(data)} octets)")
+        return cle
+
+    def soumettre(self, params):
+        """
+        Met un rendu en file. Renvoie son id, ou None si la file est pleine.
+        Lève KeyError si le modèle est inconnu.
+        """
+        lignes = params.pop('lignes', None)
+        if not isinstance(lignes, dict):
+            raise ValueError("champ 'lignes' manquant")
+        if not _MOTIF_CLE.match(str(params.get('modele', ''))) or not os.path.exists(chemin_modele(params['modele'])):
+            raise KeyError(params.get('modele'))
+        self.purger()
+        with self.verrou:
+            actifs = sum(1 for r in self.rendus.values() if r['etat'] in ('en_attente', 'en_cours'))
+            if actifs >= self.workers + self.file_max:
+                return None
+            rendu_id = uuid.uuid4().hex
+            sortie = os.path.join(DOSSIER_SERVICE, 'rendus', f"{rendu_id}.pptx")
+            self.rendus[rendu_id] = {
+                'etat': 'en_attente', 'faites': 0, 'total': len(lignes.get('data', [])),
+                'soumis': time.time(), 'fin': None,
+                'erreur': None, 'rapport': None, 'fichier': sortie,
+            }
+        args = (executer_rendu, rendu_id, params, json.dumps(lignes), sortie)
+        try:
+            future = self.pool.submit(*args)
+        except BrokenProcessPool:
+            # Un worker est mort (mémoire...) : le pool est recréé
+            self.logger.warning("Pool de rendu cassé, redémarrage des workers")
+            self.pool = self._nouveau_pool()
+            future = self.pool.submit(*args)
+        future.add_done_callback(lambda f: self._terminer(rendu_id, f))
+        return rendu_id
+
+    def _terminer(self, rendu_id, future):
+        erreur = future.exception()
+        with self.verrou:
+            rendu = self.rendus.get(rendu_id)
+            if rendu is None:
+                return
+            rendu['fin'] = time.time()
+            if erreur is not None:
+                rendu['etat'] = 'echec'
+                rendu['erreur'] = f"{type(erreur).__name__}: {erreur}"
+                self.logger.warning(f"Échec du rendu {rendu_id}: {rendu['erreur']}")
+            else:
+                rendu['etat'] = 'termine'
+                rendu['faites'] = rendu['total']
+                rendu['rapport'] = future.result()
+                self.logger.info(f"Rendu {rendu_id} terminé en {rendu['fin'] - rendu['soumis']:.2f}s")
+
+    def etat(self, rendu_id):
+        with self.verrou:
+            rendu = self.rendus.get(rendu_id)
+            if rendu is None:
+                return None
+            position = None
+            if rendu['etat'] == 'en_attente':
+                position = sum(1 for r in self.rendus.values()
+                               if r['etat'] == 'en_attente' and r['soumis'] < rendu['soumis'])
+            fin = rendu['fin'] or time.time()
+            return {
+                'rendu': rendu_id, 'etat': rendu['etat'], 'position': position,
+                'faites': rendu['faites'], 'total': rendu['total'],
+                'secondes': round(fin - rendu['soumis'], 3),
+                'erreur': rendu['erreur'], 'rapport': rendu['rapport'],
+            }
+
+    def fichier(self, rendu_id):
+        with self.verrou:
+            rendu = self.rendus.get(rendu_id)
+            return rendu['fichier'] if rendu and rendu['etat'] == 'termine' else None
+
+    def supprimer(self, rendu_id):
+        with self.verrou:
+            rendu = self.rendus.get(rendu_id)
+            if rendu is None or rendu['etat'] in ('en_attente', 'en_cours'):
+                return False
+            del self.rendus[rendu_id]
+        if os.path.exists(rendu['fichier']):
+            os.remove(rendu['fichier'])
+        return True
+
+    def purger(self):
+        limite = time.time() - CONSERVATION_RENDUS
+        with self.verrou:
+            expires = [i for i, r in self.rendus.items() if r['fin'] and r['fin'] < limite]
+        for rendu_id in expires:
+            self.supprimer(rendu_id)
+
+    def etat_global(self):
+        with self.verrou:
+            etats = [r['etat'] for r in self.rendus.values()]
+        return {'workers': self.workers, 'en_cours': etats.count('en_cours'),
+                'en_attente': etats.count('en_attente'),
+                'cache_decks': statistiques_decks(os.path.join(DOSSIER_CACHE, 'decks'))}
+
+    def arreter(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class GestionnaireRendu(BaseHTTPRequestHandler):
+    """
+    Routes HTTP du service (voir la docstring du module).
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        self.service.logger.debug(f"{self.address_string()} {format % args}")
+
+    def _json(self, code, contenu, entetes=None):
+        corps = json.dumps(contenu, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corps)))
+        for nom, valeur in (entetes or {}).items():
+            self.send_header(nom, valeur)
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def _corps(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _chemin(self):
+        return [p for p in urlsplit(self.path).path.split('/') if p]
+
+    def do_GET(self):
+        chemin = self._chemin()
+        if chemin == ['sante']:
+            return self._json(200, self.service.etat_global())
+        if len(chemin) == 2 and chemin[0] == 'modeles':
+            connu = _MOTIF_CLE.match(chemin[1]) and os.path.exists(chemin_modele(chemin[1]))
+            return self._json(200 if connu else 404, {'modele': chemin[1]})
+        if len(chemin) == 2 and chemin[0] == 'rendus':
+            etat = self.service.etat(chemin[1])
+            return self._json(200, etat) if etat else self._json(404, {'erreur': 'rendu inconnu'})
+        if len(chemin) == 3 and chemin[0] == 'rendus' and chemin[2] == 'pptx':
+            return self._envoyer_pptx(chemin[1])
+        self._json(404, {'erreur': 'route inconnue'})
+
+    def _envoyer_pptx(self, rendu_id):
+        fichier = self.service.fichier(rendu_id)
+        if fichier is None:
+            return self._json(404, {'erreur': 'rendu inconnu ou non terminé'})
+        with open(fichier, 'rb') as f:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/vnd.openxmlformats-officedocument.presentationml.presentation')
+            self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile, TAILLE_BLOC)
+
+    def do_POST(self):
+        chemin = self._chemin()
+        if chemin == ['modeles']:
+            return self._json(200, {'modele': self.service.enregistrer_modele(self._corps())})
+        if chemin == ['rendus']:
+            try:
+                params = json.loads(self._corps())
+                if not isinstance(params, dict):
+                    raise ValueError('objet JSON attendu')
+                rendu_id = self.service.soumettre(params)
+            except ValueError as e:
+                return self._json(400, {'erreur': f"requête invalide: {e}"})
+            except KeyError:
+                return self._json(404, {'erreur': 'modèle inconnu'})
+            if rendu_id is None:
+                return self._json(503, {'erreur': 'file de rendu pleine'}, {'Retry-After': '5'})
+            return self._json(202, {'rendu': rendu_id})
+        self._json(404, {'erreur': 'route inconnue'})
+
+    def do_DELETE(self):
+        chemin = self._chemin()
+        if len(chemin) == 2 and chemin[0] == 'rendus':
+            if self.service.supprimer(chemin[1]):
+                return self._json(200, {'rendu': chemin[1]})
+            return self._json(409, {'erreur': 'rendu inconnu ou en cours'})
+        self._json(404, {'erreur': 'route inconnue'})
+
+
+def _interrompre(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    adresse = urlsplit(SERVICE_URL)
+    parser = argparse.ArgumentParser(description='Service local de rendu PPTX')
+    parser.add_argument('--hote', default=adresse.hostname)
+    parser.add_argument('--port', type=int, default=adresse.port)
+    parser.add_argument('--workers', type=int, default=SERVICE_WORKERS, help='nombre de processus de rendu')
+    parser.add_argument('--file-max', type=int, default=SERVICE_FILE_MAX,
+                        help='rendus en attente acceptés au-delà des workers occupés')
+    parser.add_argument('--img-dir', default='img', help='dossier des images préchargé')
+    parser.add_argument('--logos-dir', default='logos', help='dossier des blasons préchargé')
+    args = parser.parse_args(argv)
+
+    logger = get_logger(__name__)
+    service = ServiceRendu(args.workers, args.file_max, args.img_dir, args.logos_dir)
+    serveur = ThreadingHTTPServer((args.hote, args.port), GestionnaireRendu)
+    serveur.daemon_threads = True
+    serveur.service = service
+    # SIGTERM comme Ctrl+C : les workers sont arrêtés avec le service
+    signal.signal(signal.SIGTERM, _interrompre)
+    logger.info(f"Service de rendu sur http://{args.hote}:{args.port} ({args.workers} worker(s))")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        serveur.server_close()
+        service.arreter()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
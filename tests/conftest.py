@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules du projet importables depuis les tests (lancés depuis la racine ou tests/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,15 @@
+import os
+
+from utils.assets_utils import images_projets
+
+
+def test_images_projets_extensions_majuscules(tmp_path):
+    for nom in ('1.JPG', '2.Png', '3.jpeg', '3.png', 'notes.txt'):
+        (tmp_path / nom).write_bytes(b'')
+    index = images_projets(str(tmp_path))
+    assert index == {
+        '1': os.path.join(str(tmp_path), '1.JPG'),
+        '2': os.path.join(str(tmp_path), '2.Png'),
+        # png prioritaire sur jpeg, comme pour EXTENSIONS_PROJET
+        '3': os.path.join(str(tmp_path), '3.png'),
+    }
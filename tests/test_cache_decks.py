@@ -0,0 +1,55 @@
+import logging
+import os
+from io import BytesIO
+
+import pandas as pd
+
+import presentation_generator
+from utils.cache_decks_utils import statistiques_decks
+
+
+def _args(tmp_path, sortie):
+    return dict(
+        model_path=BytesIO(b'modele'), df=pd.DataFrame({'Ville': ['Lyon', 'Nice']}),
+        placeholders_mapping={'{{Ville}}': 'Ville'}, img_dir=str(tmp_path / 'img'),
+        logos_dir=str(tmp_path / 'logos'), valeur_blason_active='x', slides_prototypes=None,
+        cache_dir=str(tmp_path / 'cache'), image_dpi=None, image_qualite=85, sortie=sortie,
+        niveau_compression=6, incremental=False, progression=None, prechargement=0,
+    )
+
+
+def _generer(appels):
+    def generer(sortie, **args):
+        # Sortie flux : le rendu doit passer par un fichier, pas par la mémoire
+        assert isinstance(sortie, str)
+        appels.append(sortie)
+        with open(sortie, 'wb') as f:
+            f.write(b'deck')
+        return sortie
+    return generer
+
+
+def test_sortie_flux_via_fichier_puis_cache(tmp_path):
+    appels = []
+    premier, second = BytesIO(), BytesIO()
+    presentation_generator._generer_en_cache(_generer(appels), **_args(tmp_path, premier))
+    presentation_generator._generer_en_cache(_generer(appels), **_args(tmp_path, second))
+    assert premier.getvalue() == second.getvalue() == b'deck'
+    assert len(appels) == 1
+    dossier = tmp_path / 'cache' / 'decks'
+    assert [nom for nom in os.listdir(dossier) if not nom.endswith(('.pptx', '.log'))] == []
+    stats = statistiques_decks(str(dossier))
+    assert (stats['trouves'], stats['absents'], stats['decks']) == (1, 1, 1)
+
+
+def test_deck_evince_avant_lecture(tmp_path, monkeypatch):
+    # Deck annoncé par le cache mais supprimé entre-temps : la sortie ne
+    # reçoit que le deck régénéré (avertissement hors du journal du projet)
+    monkeypatch.setattr(presentation_generator, 'get_logger', logging.getLogger)
+    monkeypatch.setattr(presentation_generator, 'chercher_deck',
+                        lambda dossier, cle: os.path.join(dossier, 'absent.pptx'))
+    appels = []
+    sortie = BytesIO()
+    presentation_generator._generer_en_cache(_generer(appels), **_args(tmp_path, sortie))
+    assert sortie.getvalue() == b'deck'
+    assert len(appels) == 1
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from utils.dataset_utils import ajouter_ligne, appliquer_schema, inferer_schema
+from utils.filtres_utils import comptes_valeurs, construire_index, etendre_index, lignes_filtrees
+
+
+def _classeur():
+    brut = pd.DataFrame({
+        'Ville': ['Lyon', 'Paris', 'Lyon', 'Nice', 'Lyon', 'Paris'],
+        'montant des travaux': ['14000000', '14000000', '500000', '750000', '14000000', '14000000'],
+    }, dtype=str)
+    schema = inferer_schema(brut)
+    return appliquer_schema(brut, schema), schema
+
+
+def test_etendre_index_colonne_inchangee():
+    df, schema = _classeur()
+    index = construire_index(df)
+    df = ajouter_ligne(df, {'Ville': 'Lyon', 'montant des travaux': '500000'}, schema)
+    etendu = etendre_index(index, df)
+    assert etendu == construire_index(df)
+    assert list(lignes_filtrees(etendu, df, {'Ville': ['Lyon']})) == [0, 2, 4, 6]
+
+
+def test_etendre_index_colonne_passee_en_texte():
+    df, schema = _classeur()
+    assert schema['montant des travaux'] != 'texte'
+    index = construire_index(df)
+    df = ajouter_ligne(df, {'Ville': 'Lyon', 'montant des travaux': 'à définir'}, schema)
+    assert schema['montant des travaux'] == 'texte'
+    etendu = etendre_index(index, df)
+    assert etendu == construire_index(df)
+    assert list(lignes_filtrees(etendu, df, {'montant des travaux': ['14000000']})) == [0, 1, 4, 5]
+    assert list(lignes_filtrees(etendu, df, {'montant des travaux': ['à définir']})) == [6]
+    comptes = comptes_valeurs(etendu, df, 'montant des travaux')
+    assert all(isinstance(valeur, str) for valeur in comptes)
+    # Les autres colonnes sont étendues, pas réindexées
+    assert list(lignes_filtrees(etendu, df, {'Ville': ['Lyon']})) == [0, 2, 4, 6]
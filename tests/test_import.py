@@ -0,0 +1,13 @@
+from benchmark import BUDGET_IMPORT, mesurer_import
+
+
+def test_import_du_coeur_sans_modules_lourds():
+    # Processus neuf : presentation_generator et batch importés seuls
+    mesure = mesurer_import()
+    assert mesure['modules_lourds'] == []
+
+
+def test_import_du_coeur_dans_le_budget():
+    # Meilleur de trois imports : une machine chargée ne fait pas échouer le test
+    secondes = min(mesurer_import()['secondes'] for _ in range(3))
+    assert secondes < BUDGET_IMPORT
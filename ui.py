@@ -1,11 +1,122 @@
 # File: ui.py
 
+import os
 import streamlit as st
 import pandas as pd
-import numpy as np
 from io import BytesIO
-from config import PLACEHOLDERS_DEFAULT
-from presentation_generator import generate_presentation
+from config import PLACEHOLDERS_DEFAULT, IMAGE_DPI, DOSSIER_CACHE, SERVICE_URL, PROCESSUS_RENDU
+from presentation_generator import exporter_volumes, generate_presentation, generer_apercu
+from utils.filtres_utils import comptes_valeurs, construire_index, etendre_index, lignes_filtrees
+from utils.cache_decks_utils import statistiques_decks
+from utils.dataset_utils import ajouter_ligne, ajouter_lignes_classeur, charger_classeur
+from utils.instrumentation_utils import lignes_tableau
+from utils.service_utils import (ServiceIndisponible, attendre_rendu, service_disponible, soumettre_rendu,
+                                 telecharger_rendu)
+from utils.template_utils import hash_contenu
+
+
+# --- Caches entre reruns (clé : hash du fichier importé + état des filtres) ---
+# Les arguments préfixés par _ ne sont pas hachés par Streamlit.
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def lire_excel(cle_excel, _data):
+    # Classeur typé (schéma inféré), relu depuis le cache Parquet si déjà vu
+    return charger_classeur(_data, DOSSIER_CACHE, cle=cle_excel)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def valeurs_distinctes(cle_excel, colonne, _df):
+    return sorted(_df[colonne].dropna().unique())
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def index_filtres(cle_excel, _df):
+    # Bitmaps valeur -> lignes, construits une fois par classeur
+    return construire_index(_df)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def filtrer_et_trier(cle_excel, filtres, col_tri, ascending, max_slides, _df, _index):
+    df_filtre = _df.iloc[lignes_filtrees(_index, _df, dict(filtres))]
+    if col_tri and col_tri != "Aucun":
+        df_filtre = df_filtre.sort_values(by=col_tri, ascending=ascending)
+    return df_filtre.head(max_slides)
+
+
+def afficher_rapport(rapport):
+    """
+    Mesures de la dernière génération (mode debug).
+    """
+    with st.expander('🔍 Mesures de génération', expanded=True):
+        st.dataframe(pd.DataFrame(lignes_tableau(rapport)), hide_index=True)
+        if rapport['slides']:
+            st.write('Durée par slide :')
+            st.dataframe(pd.DataFrame(rapport['slides']), hide_index=True)
+        if 'profil_cpu' in rapport:
+            st.code(rapport['profil_cpu'], language='text')
+        if 'profil_memoire' in rapport:
+            st.dataframe(pd.DataFrame(rapport['profil_memoire']['allocations']), hide_index=True)
+
+
+def afficher_plan(plan):
+    """
+    Couverture du plan de génération : ce que le rendu produira, avant de le lancer.
+    """
+    slides = plan['slides']
+    with st.expander(f"🧭 Plan de génération : {len(slides)} slide(s), "
+                     f"~{plan['taille_estimee'] / 1e6:.1f} Mo", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        col1.metric('Slides', len(slides))
+        col2.metric('Images introuvables', sum(1 for s in slides if s['numero_image'] and not s['image']))
+        col3.metric('Taille estimée (max)', f"{plan['taille_estimee'] / 1e6:.1f} Mo")
+        manquants = sorted({ph for s in slides for ph in s['placeholders_manquants']})
+        if manquants:
+            st.warning(f"Placeholders absents des slides modèles : {', '.join(manquants)}")
+        if plan['colonnes_absentes']:
+            st.warning(f"Colonnes mappées absentes : {', '.join(plan['colonnes_absentes'])}")
+        if plan['logos_manquants']:
+            st.warning(f"Logos introuvables : {', '.join(plan['logos_manquants'])}")
+        if plan['lignes_sans_slide']:
+            st.info(f"{plan['lignes_sans_slide']} ligne(s) sans slide modèle (activer le clonage des slides modèles).")
+        st.dataframe(pd.DataFrame([{
+            'Slide': s['position'] + 1,
+            'Modèle': s['slide_modele'] + 1,
+            'Placeholders': len(s['placeholders_resolus']),
+            'Valeurs vides': ', '.join(s['valeurs_vides']),
+            'Image': os.path.basename(s['image']) if s['image'] else (f"introuvable ({s['numero_image']})"
+                                                                      if s['numero_image'] else ''),
+            'Blasons': ', '.join(s['blasons']),
+            'Ko': round(s['octets'] / 1024),
+        } for s in slides]), hide_index=True)
+
+
+def generer_via_service(fichier_pptx, df_filtre, placeholders_map, img_dir, logos_dir, valeur_blason,
+                        slides_prototypes, image_dpi, moteur, debug):
+    """
+    Soumet le rendu au service local et affiche sa progression.
+    Renvoie (PPTX en BytesIO, rapport).
+    """
+    rendu_id = soumettre_rendu(
+        SERVICE_URL, fichier_pptx.getvalue(), df_filtre,
+        mapping=placeholders_map, img_dir=os.path.abspath(img_dir), logos_dir=os.path.abspath(logos_dir),
+        valeur_blason=valeur_blason, slides_prototypes=slides_prototypes,
+        image_dpi=image_dpi or None, moteur=moteur, rapport=debug,
+    )
+    barre = st.progress(0.0, text='Rendu en file…')
+
+    def suivi(etat):
+        if etat['etat'] == 'en_attente':
+            barre.progress(0.0, text=f"En file d'attente (position {etat['position'] + 1})")
+        elif etat['total']:
+            barre.progress(min(etat['faites'] / etat['total'], 1.0),
+                           text=f"Slides rendues : {etat['faites']}/{etat['total']}")
+
+    etat = attendre_rendu(SERVICE_URL, rendu_id, suivi)
+    barre.empty()
+    if etat['etat'] == 'echec':
+        raise ServiceIndisponible(etat['erreur'])
+    return telecharger_rendu(SERVICE_URL, rendu_id), etat['rapport']
+
 
 def run_app():
     st.set_page_config(page_title='Générateur ISOEDRE', layout='wide')
@@ -17,9 +128,29 @@ def run_app():
         img_dir = st.text_input('Dossier des images', value='img')
         logos_dir = st.text_input('Dossier blasons', value='logos')
         valeur_blason = st.text_input('Valeur blason actif', value='x')
+        clonage = st.checkbox('Cloner les slides modèles (un projet par clone)')
+        slides_prototypes = None
+        if clonage:
+            protos = st.text_input('Slides modèles (numéros, ex: 1,2)', value='1')
+            slides_prototypes = [int(n) - 1 for n in protos.replace(' ', '').split(',') if n.isdigit()]
+        image_dpi = st.number_input('Résolution des images (DPI, 0 = originale)', min_value=0, value=IMAGE_DPI, step=50)
+        moteur_xml = st.checkbox('Moteur XML rapide (gros volumes)')
+        processus = st.number_input('Processus de rendu', min_value=1, max_value=os.cpu_count() or 1,
+                                    value=PROCESSUS_RENDU,
+                                    help='Rendu parallèle des slides clonées (moteur XML), assemblées en un seul PPTX')
+        taille_volume = st.number_input('Projets par volume (0 = un seul PPTX)', min_value=0, value=0, step=50,
+                                        help='Export en zip de plusieurs PPTX, à mémoire bornée')
+        via_service = st.checkbox('Générer via le service de rendu',
+                                  help=f"Rendu délégué à service.py ({SERVICE_URL}) : l'interface reste disponible")
         debug = st.checkbox('Mode debug')
+        profil_cpu = profil_memoire = False
         if debug:
-            st.info('Logs mode debug activé')
+            st.info('Mesures de génération affichées après le rendu')
+            profil_cpu = st.checkbox('Profil CPU (cProfile)')
+            profil_memoire = st.checkbox('Profil mémoire (tracemalloc)')
+            stats = statistiques_decks(os.path.join(DOSSIER_CACHE, 'decks'))
+            st.caption(f"Cache des decks : {stats['decks']} deck(s), {stats['octets'] / 1e6:.1f} Mo, "
+                       f"{stats['trouves']} servi(s) du cache, {stats['absents']} généré(s)")
 
     # Upload des fichiers
     col1, col2 = st.columns(2)
@@ -28,12 +159,22 @@ def run_app():
     with col2:
         fichier_pptx = st.file_uploader('📥 Modèle PPTX', type=['pptx'])
 
-    # Buffer pour l’Excel mis à jour
-    excel_buf = None
-
     if fichier_excel and fichier_pptx:
-        # Lecture
-        df = pd.read_excel(fichier_excel, header=1, dtype=str)
+        # Lecture (mise en cache sous le hash du fichier)
+        cle_fichier = hash_contenu(fichier_excel.getvalue())
+        # Classeur de travail gardé en session, projets ajoutés compris :
+        # octets du classeur, DataFrame typé, schéma et index des filtres
+        # (None tant que rien n'est ajouté : index du fichier)
+        classeur = st.session_state.get('classeur')
+        if not classeur or classeur['source'] != cle_fichier:
+            df, schema = lire_excel(cle_fichier, fichier_excel.getvalue())
+            classeur = st.session_state.classeur = {
+                'source': cle_fichier, 'data': fichier_excel.getvalue(), 'df': df, 'schema': dict(schema),
+                'index': None, 'ajouts': 0, 'enregistres': 0,
+            }
+        df = classeur['df']
+        # Le DataFrame ne correspond plus au fichier : clé distincte
+        cle_excel = f"{cle_fichier}+{classeur['ajouts']}" if classeur['ajouts'] else cle_fichier
 
         # Initialisation du compteur de filtres
         if 'n_filters' not in st.session_state:
@@ -54,21 +195,31 @@ def run_app():
                 submitted = st.form_submit_button('Ajouter')
 
             if submitted:
-                df.loc[len(df)] = new_data
+                # Seule la nouvelle ligne est indexée
+                index = classeur['index'] or index_filtres(cle_excel, df)
+                df = classeur['df'] = ajouter_ligne(df, new_data, classeur['schema'])
+                classeur['index'] = etendre_index(index, df)
+                classeur['ajouts'] += 1
+                cle_excel = f"{cle_fichier}+{classeur['ajouts']}"
                 st.success('✅ Projet ajouté !')
-                # Préparer buffer Excel hors du formulaire
-                excel_buf = BytesIO()
-                df.to_excel(excel_buf, index=False)
-                excel_buf.seek(0)
+
+            # Projets ajoutés écrits ensemble à la suite du classeur d'origine
+            en_attente = classeur['ajouts'] - classeur['enregistres']
+            if en_attente and st.button(f"💾 Enregistrer {en_attente} projet(s) dans le classeur"):
+                classeur['data'] = ajouter_lignes_classeur(classeur['data'], df.iloc[len(df) - en_attente:],
+                                                           df, classeur['schema'], DOSSIER_CACHE)
+                classeur['enregistres'] = classeur['ajouts']
+                st.success(f"✅ {en_attente} projet(s) enregistré(s) dans le classeur")
 
         # Bouton de téléchargement du nouvel Excel (hors du form)
-        if excel_buf:
+        if classeur['enregistres']:
             st.download_button(
                 '🔄 Télécharger Excel mis à jour',
-                data=excel_buf,
+                data=classeur['data'],
                 file_name='reference_mise_a_jour.xlsx',
                 mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
             )
+        index = classeur['index'] or index_filtres(cle_excel, df)
 
         # --- Section filtres et tri ---
         st.subheader("🔍 Filtres et tri")
@@ -83,10 +234,13 @@ def run_app():
                     key=f"filter_col_{i}"
                 )
                 if col_filtre and col_filtre != "Aucun":
-                    vals = sorted(df[col_filtre].dropna().unique())
+                    vals = valeurs_distinctes(cle_excel, col_filtre, df)
+                    # Nombre de projets gardés par chaque valeur, compte tenu des filtres précédents
+                    comptes = comptes_valeurs(index, df, col_filtre, filtres)
                     sel = st.multiselect(
                         f"Valeurs pour {col_filtre}",
                         options=vals,
+                        format_func=lambda v, comptes=comptes: f"{v} ({comptes.get(v, 0)})",
                         key=f"filter_vals_{i}"
                     )
                     if sel:
@@ -98,7 +252,7 @@ def run_app():
 
             # Section tri
             st.markdown("---")
-            colonnes_tri = ["Aucun"] + list(df.select_dtypes(include=[np.number, 'datetime']).columns)
+            colonnes_tri = ["Aucun"] + list(df.select_dtypes(include=['number', 'datetime']).columns)
             col_tri = st.selectbox("Trier par", options=colonnes_tri, key="col_tri")
             sens_tri = st.radio("Sens du tri", options=["Croissant", "Décroissant"], key="sens_tri")
 
@@ -111,18 +265,12 @@ def run_app():
                 key="max_slides"
             )
 
-        # Application des filtres
-        df_filtre = df.copy()
-        for colonne, valeurs in filtres.items():
-            df_filtre = df_filtre[df_filtre[colonne].isin(valeurs)]
-
-        # Application du tri
-        if st.session_state.col_tri and st.session_state.col_tri != "Aucun":
-            ascending = st.session_state.sens_tri == "Croissant"
-            df_filtre = df_filtre.sort_values(by=st.session_state.col_tri, ascending=ascending)
-
-        # Limitation du nombre de slides
-        df_filtre = df_filtre.head(st.session_state.max_slides)
+        # Application des filtres, du tri et de la limite (mis en cache)
+        etat_filtres = tuple((col, tuple(vals)) for col, vals in filtres.items())
+        df_filtre = filtrer_et_trier(
+            cle_excel, etat_filtres, st.session_state.col_tri,
+            st.session_state.sens_tri == "Croissant", st.session_state.max_slides, df, index
+        )
 
         # Affichage du DataFrame filtré
         st.dataframe(df_filtre)
@@ -135,19 +283,89 @@ def run_app():
                 col_sel = st.selectbox(ph, options=[''] + list(df_filtre.columns), index=idx, key=f"map_{ph}")
                 placeholders_map[ph] = col_sel
 
+            # Aperçu d'une seule ligne, redessiné à chaque changement du mapping
+            if len(df_filtre):
+                titre = placeholders_map.get('{{Titre_Residence}}')
+                ligne_apercu = st.selectbox(
+                    'Aperçu de la ligne', options=range(len(df_filtre)),
+                    format_func=lambda i: f"{i + 1}. {df_filtre[titre].iloc[i]}" if titre else str(i + 1),
+                    key='ligne_apercu'
+                )
+                apercu = generer_apercu(fichier_pptx, df_filtre, ligne_apercu, placeholders_map, img_dir, logos_dir,
+                                        valeur_blason, slides_prototypes, format_image='JPEG')
+                if apercu:
+                    st.image(apercu, caption='Aperçu simplifié (textes, image projet, blasons)')
+                else:
+                    st.info('Pas de slide modèle pour cette ligne (activer le clonage des slides modèles).')
+
+        # Plan de génération (simulation), recalculé à chaque changement
+        plan = generate_presentation(fichier_pptx, df_filtre, placeholders_map, img_dir, logos_dir, valeur_blason,
+                                     slides_prototypes, simulation=True)
+        afficher_plan(plan)
+
         # --- Génération PPTX ---
-        if st.button('🚀 Générer PPTX'):
-            buf = generate_presentation(
-                model_path=fichier_pptx,
-                df=df_filtre,
-                placeholders_mapping=placeholders_map,
-                img_dir=img_dir,
-                logos_dir=logos_dir,
-                valeur_blason_active=valeur_blason
-            )
-            st.download_button(
-                '🔽 Télécharger PPTX',
-                data=buf,
-                file_name='presentation_output.pptx',
-                mime='application/vnd.openxmlformats-officedocument.presentationml.presentation'
-            )
+        # Le PPTX généré est gardé en session : le clic sur le bouton de
+        # téléchargement (qui relance le script) ne le régénère pas.
+        cle_pptx = hash_contenu(repr((
+            hash_contenu(fichier_pptx.getvalue()), cle_excel, etat_filtres,
+            st.session_state.col_tri, st.session_state.sens_tri, st.session_state.max_slides,
+            sorted(placeholders_map.items()), img_dir, logos_dir, valeur_blason,
+            slides_prototypes, image_dpi, moteur_xml, processus, taille_volume, debug, profil_cpu, profil_memoire
+        )).encode())
+        genere = st.session_state.get('pptx_genere')
+        if st.button('🚀 Générer PPTX') and not (genere and genere['cle'] == cle_pptx):
+            rapport = {} if debug else None
+            buf = None
+            if taille_volume:
+                buf = BytesIO()
+                barre = st.progress(0.0, text='Volumes…')
+                exporter_volumes(
+                    fichier_pptx, df_filtre, placeholders_map, img_dir, logos_dir, valeur_blason,
+                    slides_prototypes, buf, taille_volume=taille_volume, archive=True,
+                    progression=lambda k, n: barre.progress(k / n, text=f"Volume {k}/{n}"),
+                    image_dpi=image_dpi or None, moteur='xml' if moteur_xml else 'pptx', processus=processus
+                )
+                barre.empty()
+                buf.seek(0)
+            elif via_service:
+                if service_disponible(SERVICE_URL):
+                    try:
+                        buf, rapport = generer_via_service(
+                            fichier_pptx, df_filtre, placeholders_map, img_dir, logos_dir, valeur_blason,
+                            slides_prototypes, image_dpi, 'xml' if moteur_xml else 'pptx', debug)
+                    except ServiceIndisponible as e:
+                        st.warning(f"Échec du service de rendu ({e}) : génération locale.")
+                else:
+                    st.warning(f"Service de rendu injoignable sur {SERVICE_URL} : génération locale.")
+            if buf is None:
+                buf = generate_presentation(
+                    model_path=fichier_pptx,
+                    df=df_filtre,
+                    placeholders_mapping=placeholders_map,
+                    img_dir=img_dir,
+                    logos_dir=logos_dir,
+                    valeur_blason_active=valeur_blason,
+                    slides_prototypes=slides_prototypes,
+                    image_dpi=image_dpi or None,
+                    rapport=rapport,
+                    profil_cpu=profil_cpu,
+                    profil_memoire=profil_memoire,
+                    moteur='xml' if moteur_xml else 'pptx',
+                    processus=processus
+                )
+            # Le BytesIO est conservé tel quel : pas de copie supplémentaire
+            genere = st.session_state.pptx_genere = {'cle': cle_pptx, 'data': buf, 'rapport': rapport,
+                                                     'zip': bool(taille_volume)}
+        if genere and genere['cle'] == cle_pptx:
+            if genere.get('zip'):
+                st.download_button('🔽 Télécharger les volumes (zip)', data=genere['data'],
+                                   file_name='presentation_output.zip', mime='application/zip')
+            else:
+                st.download_button(
+                    '🔽 Télécharger PPTX',
+                    data=genere['data'],
+                    file_name='presentation_output.pptx',
+                    mime='application/vnd.openxmlformats-officedocument.presentationml.presentation'
+                )
+            if genere.get('rapport'):
+                afficher_rapport(genere['rapport'])
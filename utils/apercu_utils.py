@@ -0,0 +1,308 @@
+# Aperçu PNG d'une slide pour une seule ligne, dessiné avec Pillow à partir
+# du XML du modèle : ni python-pptx, ni deck complet. Rendu simplifié (textes,
+# images, blasons aux positions EMU ; formes et fonds de masque ignorés).
+import logging
+from io import BytesIO
+
+from utils import pptx_xml_utils as pptx_xml
+from utils.blasons_utils import disposition_blasons
+from utils.template_utils import hash_contenu
+from utils.text_utils import substituer_placeholders
+
+# Largeur de l'aperçu en pixels (la hauteur suit le format des slides)
+LARGEUR_APERCU = 960
+
+# Taille de police par défaut (centièmes de point) et marges internes (EMU)
+TAILLE_DEFAUT = 1800
+MARGES_TEXTE = (91440, 45720)
+EMU_PAR_POINT = 12700
+
+COULEUR_TEXTE = (33, 33, 33)
+COULEUR_ZONE_VIDE = (220, 220, 220)
+
+# Hash du modèle -> gabarit (format, formes de chaque slide, médias)
+_GABARITS = {}
+
+# (hash modèle, slide, largeur) -> fond de slide (formes statiques dessinées)
+_FONDS = {}
+
+# (source, (largeur, hauteur)) -> image redimensionnée, bornée à MAX_VIGNETTES
+_VIGNETTES = {}
+MAX_VIGNETTES = 256
+
+# (taille px, gras) -> police
+_POLICES = {}
+
+# (taille px, gras, caractère) -> (masque, décalage x, décalage y, avance)
+_GLYPHES = {}
+
+# (taille px, gras, mot) -> (masque, largeur), borné à MAX_MOTS
+_MOTS = {}
+MAX_MOTS = 20000
+
+
+def _q(nom):
+    prefixe, _, local = nom.partition(':')
+    return f"{{{pptx_xml.NS[prefixe]}}}{local}"
+
+
+def _police(taille, gras):
+    from PIL import ImageFont
+    cle = (taille, gras)
+    if cle not in _POLICES:
+        try:
+            _POLICES[cle] = ImageFont.truetype('DejaVuSans-Bold.ttf' if gras else 'DejaVuSans.ttf', taille)
+        except OSError:
+            _POLICES[cle] = ImageFont.load_default(taille)
+    return _POLICES[cle]
+
+
+def _glyphe(taille, gras, caractere):
+    """
+    Glyphe rendu une fois par police : le texte de l'aperçu est composé par
+    collage de masques, bien plus rapide que ImageDraw.text ligne à ligne.
+    """
+    cle = (taille, gras, caractere)
+    if cle not in _GLYPHES:
+        from PIL import Image, ImageDraw
+        police = _police(taille, gras)
+        x0, y0, x1, y1 = police.getbbox(caractere)
+        masque = None
+        if x1 > x0 and y1 > y0:
+            masque = Image.new('L', (x1 - x0, y1 - y0))
+            ImageDraw.Draw(masque).text((-x0, -y0), caractere, font=police, fill=255)
+        _GLYPHES[cle] = (masque, x0, y0, police.getlength(caractere))
+    return _GLYPHES[cle]
+
+
+def _mot(mot, taille, gras):
+    """
+    Masque d'un mot composé de ses glyphes, et sa largeur en px.
+    """
+    cle = (taille, gras, mot)
+    if cle not in _MOTS:
+        from PIL import Image
+        if len(_MOTS) >= MAX_MOTS:
+            del _MOTS[next(iter(_MOTS))]
+        glyphes = [_glyphe(taille, gras, c) for c in mot]
+        largeur = sum(g[3] for g in glyphes)
+        ascendant, descendant = _police(taille, gras).getmetrics()
+        masque = Image.new('L', (int(largeur) + taille, ascendant + descendant))
+        x = 0
+        for glyphe, dx, dy, avance in glyphes:
+            if glyphe is not None:
+                masque.paste(255, (round(x + dx), dy), glyphe)
+            x += avance
+        _MOTS[cle] = (masque, largeur)
+    return _MOTS[cle]
+
+
+def _ecrire(img, x, y, texte, taille, gras, couleur):
+    espace = _glyphe(taille, gras, ' ')[3]
+    for mot in texte.split(' '):
+        if mot:
+            masque, largeur = _mot(mot, taille, gras)
+            img.paste(couleur, (round(x), round(y)), masque)
+            x += largeur
+        x += espace
+
+
+def _paragraphes(element):
+    """
+    Paragraphes d'une forme texte : textes des runs, alignement et style du
+    premier run (taille, gras, couleur sRGB).
+    """
+    corps = element.find(_q('p:txBody'))
+    if corps is None:
+        return []
+    resultat = []
+    for p in corps.findall(_q('a:p')):
+        runs = p.findall(_q('a:r'))
+        rpr = runs[0].find(_q('a:rPr')) if runs else p.find(_q('a:endParaRPr'))
+        ppr = p.find(_q('a:pPr'))
+        couleur = rpr.find(f"{_q('a:solidFill')}/{_q('a:srgbClr')}") if rpr is not None else None
+        resultat.append({
+            'runs': [r.findtext(_q('a:t')) or '' for r in runs],
+            'alignement': ppr.get('algn', 'l') if ppr is not None else 'l',
+            'taille': int(rpr.get('sz', TAILLE_DEFAUT)) if rpr is not None else TAILLE_DEFAUT,
+            'gras': rpr is not None and rpr.get('b') in ('1', 'true'),
+            'couleur': '#' + couleur.get('val') if couleur is not None else None,
+        })
+    return resultat
+
+
+def gabarit_modele(data):
+    """
+    Gabarit d'aperçu d'un modèle (mis en cache sous son hash) : format des
+    slides et, pour chaque slide, ses formes de premier niveau (type,
+    géométrie, image, paragraphes), dans l'ordre de l'index modèle.
+    """
+    cle = hash_contenu(data)
+    if cle in _GABARITS:
+        return _GABARITS[cle]
+    paquet = pptx_xml.ouvrir_paquet(data)
+    taille = pptx_xml.xml_part(paquet, paquet['presentation']).find(_q('p:sldSz'))
+    slides = []
+    for partname in pptx_xml.slides(paquet):
+        relations = pptx_xml.relations(paquet, partname)
+        formes = []
+        for element in pptx_xml.formes(pptx_xml.xml_part(paquet, partname)):
+            blip = element.find(f".//{_q('a:blip')}")
+            rId = blip.get(f"{{{pptx_xml.NS['r']}}}embed") if blip is not None else None
+            formes.append({
+                'type': element.tag.rpartition('}')[2],
+                'geometrie': pptx_xml.geometrie(element),
+                'image': relations[rId][1] if rId in relations else None,
+                'paragraphes': _paragraphes(element),
+            })
+        slides.append(formes)
+    _GABARITS[cle] = {
+        'cle': cle,
+        'taille': (int(taille.get('cx')), int(taille.get('cy'))),
+        'slides': slides,
+        'medias': {f['image']: paquet['membres'][f['image']]
+                   for formes in slides for f in formes if f['image']},
+    }
+    return _GABARITS[cle]
+
+
+def _vignette(source, octets, taille):
+    """
+    Image `source` redimensionnée à `taille` (px), gardée en mémoire.
+    `octets` : contenu binaire (`source` sert alors de clé), ou None pour
+    lire le chemin `source`.
+    """
+    from PIL import Image
+    cle = (source, taille)
+    if cle not in _VIGNETTES:
+        if len(_VIGNETTES) >= MAX_VIGNETTES:
+            del _VIGNETTES[next(iter(_VIGNETTES))]
+        try:
+            img = Image.open(BytesIO(octets) if octets is not None else source)
+            img.draft('RGB', taille)  # JPEG : décodage directement à l'échelle
+            _VIGNETTES[cle] = img.convert('RGBA').resize(taille)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Aperçu : image illisible {source}: {e}")
+            _VIGNETTES[cle] = None
+    return _VIGNETTES[cle]
+
+
+def _boite(geometrie, echelle):
+    x, y, w, h = geometrie
+    return round(x * echelle), round(y * echelle), max(1, round(w * echelle)), max(1, round(h * echelle))
+
+
+def _coller(fond, source, octets, geometrie, echelle):
+    x, y, w, h = _boite(geometrie, echelle)
+    img = _vignette(source, octets, (w, h))
+    if img is not None:
+        fond.alpha_composite(img, (max(x, 0), max(y, 0)), (max(-x, 0), max(-y, 0)))
+
+
+def _lignes(texte, taille, gras, largeur):
+    """
+    Découpe `texte` en lignes tenant dans `largeur` px (coupure aux espaces).
+    Renvoie [(ligne, largeur px)].
+    """
+    espace = _glyphe(taille, gras, ' ')[3]
+    lignes = []
+    for bloc in texte.split('\n'):
+        courante, largeur_courante = '', 0
+        for mot in bloc.split(' '):
+            largeur_mot = _mot(mot, taille, gras)[1] if mot else 0
+            if courante and largeur_courante + espace + largeur_mot > largeur:
+                lignes.append((courante, largeur_courante))
+                courante, largeur_courante = mot, largeur_mot
+            elif courante:
+                courante, largeur_courante = f"{courante} {mot}", largeur_courante + espace + largeur_mot
+            else:
+                courante, largeur_courante = mot, largeur_mot
+        lignes.append((courante, largeur_courante))
+    return lignes
+
+
+def _dessiner_texte(img, forme, textes, echelle):
+    x, y, w, _ = forme['geometrie']
+    marge_x, marge_y = MARGES_TEXTE
+    gauche, haut = (x + marge_x) * echelle, (y + marge_y) * echelle
+    largeur = max(1, (w - 2 * marge_x) * echelle)
+    for para, texte in zip(forme['paragraphes'], textes):
+        taille = max(1, round(para['taille'] / 100 * EMU_PAR_POINT * echelle))
+        couleur = para['couleur'] or COULEUR_TEXTE
+        for ligne, largeur_ligne in _lignes(texte, taille, para['gras'], largeur):
+            decalage = 0
+            if para['alignement'] in ('ctr', 'r'):
+                reste = largeur - largeur_ligne
+                decalage = reste / 2 if para['alignement'] == 'ctr' else reste
+            _ecrire(img, gauche + decalage, haut, ligne, taille, para['gras'], couleur)
+            haut += taille * 1.2
+
+
+def _dynamique(forme, i, index_slide):
+    return (i in (index_slide['image_projet'], index_slide['blason_centre'])
+            or any('{{' in ''.join(p['runs']) for p in forme['paragraphes']))
+
+
+def _fond(gabarit, i_slide, index_slide, largeur):
+    """
+    Fond d'une slide modèle : formes sans placeholder (images fixes, textes
+    fixes), dessiné une fois par modèle, slide et largeur.
+    """
+    from PIL import Image
+    cle = (gabarit['cle'], i_slide, largeur)
+    if cle not in _FONDS:
+        cx, cy = gabarit['taille']
+        echelle = largeur / cx
+        fond = Image.new('RGBA', (largeur, round(cy * echelle)), 'white')
+        for i, forme in enumerate(gabarit['slides'][i_slide]):
+            if forme['geometrie'] is None or _dynamique(forme, i, index_slide):
+                continue
+            if forme['image']:
+                _coller(fond, forme['image'], gabarit['medias'][forme['image']], forme['geometrie'], echelle)
+            elif forme['paragraphes']:
+                _dessiner_texte(fond, forme, [''.join(p['runs']) for p in forme['paragraphes']], echelle)
+        _FONDS[cle] = fond
+    return _FONDS[cle]
+
+
+def dessiner_apercu(gabarit, i_slide, index_slide, valeurs, image_projet, logos, largeur=LARGEUR_APERCU,
+                    format_image='PNG'):
+    """
+    Aperçu (octets, PNG par défaut, ou JPEG plus rapide à encoder) de la
+    slide modèle `i_slide` remplie : `valeurs` {texte du placeholder dans la
+    slide: valeur}, `image_projet` chemin ou None, `logos` [(clé, octets)]
+    des blasons actifs.
+    """
+    from PIL import ImageDraw
+    cx, _ = gabarit['taille']
+    echelle = largeur / cx
+    img = _fond(gabarit, i_slide, index_slide, largeur).copy()
+    dessin = ImageDraw.Draw(img)
+    formes = gabarit['slides'][i_slide]
+    for i, forme in enumerate(formes):
+        if forme['geometrie'] is None or not _dynamique(forme, i, index_slide):
+            continue
+        if i == index_slide['image_projet']:
+            if image_projet:
+                _coller(img, image_projet, None, forme['geometrie'], echelle)
+            else:
+                x, y, w, h = _boite(forme['geometrie'], echelle)
+                dessin.rectangle((x, y, x + w, y + h), fill=COULEUR_ZONE_VIDE)
+        elif i != index_slide['blason_centre']:
+            textes = [''.join(substituer_placeholders(p['runs'], valeurs)[0]) for p in forme['paragraphes']]
+            _dessiner_texte(img, forme, textes, echelle)
+    if logos:
+        centre = formes[index_slide['blason_centre']]['geometrie'] if index_slide['blason_centre'] is not None else None
+        if centre:
+            x, y, w, h = centre
+            boite = (x + w // 2, y + h // 2, w, h)
+        else:
+            boite = (cx // 2, gabarit['taille'][1] // 2, 1000000, 1000000)
+        for (cle, octets), geometrie in zip(logos, disposition_blasons(len(logos), boite)):
+            _coller(img, cle, octets, tuple(int(v) for v in geometrie), echelle)
+    buf = BytesIO()
+    if format_image == 'PNG':
+        img.convert('RGB').save(buf, format='PNG', compress_level=1)
+    else:
+        img.convert('RGB').save(buf, format=format_image, quality=90)
+    return buf.getvalue()
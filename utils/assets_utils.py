@@ -0,0 +1,133 @@
+import os
+import logging
+import weakref
+from copy import deepcopy
+from io import BytesIO
+from utils.instrumentation_utils import compter
+
+# Extensions des images projet, par ordre de priorité
+EXTENSIONS_PROJET = ['png', 'jpg', 'jpeg']
+
+# Dossier d'images -> (mtime, {numéro projet: chemin})
+_IMAGES_PROJETS = {}
+
+# Dossier de logos -> (mtime, {nom de fichier: octets ou None si pas encore lu})
+_LOGOS = {}
+
+# Package PPTX -> {clé: ImagePart} : une seule part image par logo et par deck.
+# Valeurs faibles : une ImagePart référence son package, qui resterait sinon
+# en vie (avec tous ses médias) après la génération
+_PARTS_IMAGES = weakref.WeakKeyDictionary()
+
+# Package PPTX -> {clé: p:pic} : élément image préconstruit, cloné à chaque insertion
+_MODELES_PIC = weakref.WeakKeyDictionary()
+
+
+def _mtime(dossier):
+    try:
+        return os.stat(dossier).st_mtime_ns
+    except OSError:
+        return None
+
+
+def images_projets(img_dir):
+    """
+    Index numéro projet -> chemin de l'image, construit en un seul
+    parcours du dossier et rafraîchi seulement si son mtime change.
+    """
+    mtime = _mtime(img_dir)
+    cache = _IMAGES_PROJETS.get(img_dir)
+    if cache and cache[0] == mtime:
+        return cache[1]
+    index = {}
+    if mtime is not None:
+        fichiers = set(os.listdir(img_dir))
+        for ext in reversed(EXTENSIONS_PROJET):
+            for nom in fichiers:
+                base, _, extension = nom.rpartition('.')
+                # Extension sans tenir compte de la casse : 1.JPG comme 1.jpg
+                if extension.lower() == ext:
+                    index[base] = os.path.join(img_dir, nom)
+    else:
+        logging.getLogger(__name__).warning(f"Dossier d'images introuvable: {img_dir}")
+    _IMAGES_PROJETS[img_dir] = (mtime, index)
+    return index
+
+
+def chercher_image_projet(img_dir, num):
+    """
+    Chemin de l'image du projet `num` ({num}.png, .jpg ou .jpeg), ou None.
+    """
+    path = images_projets(img_dir).get(num)
+    compter('images_recherchees')
+    compter('images_trouvees' if path else 'images_introuvables')
+    return path
+
+
+def logos_blasons(logos_dir):
+    """
+    Logos disponibles dans `logos_dir` (nom de fichier -> octets). Les octets
+    sont lus au premier usage puis gardés en mémoire ; l'index est rafraîchi
+    seulement si le mtime du dossier change.
+    """
+    mtime = _mtime(logos_dir)
+    cache = _LOGOS.get(logos_dir)
+    if cache and cache[0] == mtime:
+        return cache[1]
+    logos = dict.fromkeys(os.listdir(logos_dir)) if mtime is not None else {}
+    _LOGOS[logos_dir] = (mtime, logos)
+    return logos
+
+
+def lire_logo(logos_dir, filename):
+    """
+    Octets du logo `filename`, ou None s'il n'existe pas.
+    """
+    logos = logos_blasons(logos_dir)
+    if filename not in logos:
+        return None
+    if logos[filename] is None:
+        with open(os.path.join(logos_dir, filename), 'rb') as f:
+            logos[filename] = f.read()
+    return logos[filename]
+
+
+def ajouter_image(slide, cle, octets, x, y, w, h, nom=None, shape_id=None):
+    """
+    Ajoute une image à la slide en réutilisant la part image déjà créée
+    pour `cle` dans ce deck (pas de relecture ni de re-hash des octets).
+    Le p:pic est cloné depuis un modèle préconstruit pour `cle`.
+    `nom` sert de description de l'image, comme avec add_picture(chemin) ;
+    `shape_id` évite de rechercher le prochain identifiant libre.
+    """
+    from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+    from pptx.oxml.ns import qn
+    from pptx.oxml.shapes.picture import CT_Picture
+    package = slide.part.package
+    parts = _PARTS_IMAGES.setdefault(package, weakref.WeakValueDictionary())
+    image_part = parts.get(cle)
+    if image_part is None:
+        image_part, rId = slide.part.get_or_add_image_part(BytesIO(octets))
+        parts[cle] = image_part
+        compter('images_octets', len(image_part.blob))
+    else:
+        rId = slide.part.relate_to(image_part, RT.IMAGE)
+        compter('images_parts_reutilisees')
+
+    modeles = _MODELES_PIC.setdefault(package, {})
+    if cle not in modeles:
+        modeles[cle] = CT_Picture.new_pic(0, '', nom or image_part.desc, '', 0, 0, 0, 0)
+    pic = deepcopy(modeles[cle])
+    shape_id = shape_id or slide.shapes._next_shape_id
+    cNvPr = pic.nvPicPr.cNvPr
+    cNvPr.set('id', str(shape_id))
+    cNvPr.set('name', f"Picture {shape_id - 1}")
+    pic.blipFill.blip.set(qn('r:embed'), rId)
+    # Même arrondi que add_picture (%d)
+    xfrm = pic.spPr.xfrm
+    xfrm.off.set('x', str(int(x)))
+    xfrm.off.set('y', str(int(y)))
+    xfrm.ext.set('cx', str(int(w)))
+    xfrm.ext.set('cy', str(int(h)))
+    slide.shapes._spTree.insert_element_before(pic, 'p:extLst')
+    return slide.shapes._shape_factory(pic)
@@ -1,41 +1,60 @@
 import os
 import logging
+from utils.assets_utils import ajouter_image, lire_logo
+from utils.instrumentation_utils import compter
 
-def gerer_blasons_ameliore(slide, projet, mapping_blasons, logos_dir, valeur_active='x'):
+# (nombre de blasons, boîte du centre) -> positions (x, y, w, h) de chaque blason
+_DISPOSITIONS = {}
+
+
+def disposition_blasons(nombre, boite):
+    """
+    Positions des `nombre` blasons en ligne verticale autour du centre
+    `boite` = (cx, cy, w, h), calculées une fois par combinaison.
+    La géométrie ne dépend que du nombre de blasons actifs, pas de lesquels.
+    """
+    cle = (nombre, boite)
+    if cle not in _DISPOSITIONS:
+        cx, cy, w, h = boite
+        esp = h * 1.2
+        _DISPOSITIONS[cle] = [
+            (cx - w//2, cy - (nombre//2)*esp + i*esp - h//2, w, h)
+            for i in range(nombre)
+        ]
+    return _DISPOSITIONS[cle]
+
+
+def gerer_blasons_ameliore(slide, projet, mapping_blasons, logos_dir, valeur_active='x', centre=None):
     """
     Affiche dynamiquement les blasons actifs autour d'un centre.
+    `centre` permet de fournir directement la shape blason_centre (index modèle).
     """
     logger = logging.getLogger(__name__)
     actifs = []
     for col, filename in mapping_blasons.items():
         if str(projet.get(col, '')).strip().lower() == valeur_active.lower():
-            path = os.path.join(logos_dir, filename)
-            if os.path.exists(path):
-                actifs.append(path)
+            if lire_logo(logos_dir, filename) is not None:
+                actifs.append(filename)
     if not actifs:
         return []
     # déterminer centre
-    centre = None
-    for shp in slide.shapes:
-        if getattr(shp, 'name', '') == 'blason_centre':
-            centre = shp
-            break
+    if centre is None:
+        for shp in slide.shapes:
+            if getattr(shp, 'name', '') == 'blason_centre':
+                centre = shp
+                break
     if centre:
-        cx = centre.left + centre.width//2
-        cy = centre.top + centre.height//2
+        boite = (centre.left + centre.width//2, centre.top + centre.height//2, centre.width, centre.height)
         try:
             centre._element.getparent().remove(centre._element)
         except:
             pass
-        w, h = centre.width, centre.height
     else:
-        cx = slide.slide_width//2
-        cy = slide.slide_height//2
-        w, h = 1000000, 1000000
+        boite = (slide.slide_width//2, slide.slide_height//2, 1000000, 1000000)
     # positionner en ligne verticale
-    esp = h * 1.2
-    for i, path in enumerate(actifs):
-        x = cx - w//2
-        y = cy - (len(actifs)//2)*esp + i*esp - h//2
-        slide.shapes.add_picture(path, x, y, w, h)
-    return actifs
\ No newline at end of file
+    shape_id = slide.shapes._next_shape_id
+    for i, (filename, (x, y, w, h)) in enumerate(zip(actifs, disposition_blasons(len(actifs), boite))):
+        ajouter_image(slide, (logos_dir, filename), lire_logo(logos_dir, filename), x, y, w, h,
+                      nom=filename, shape_id=shape_id + i)
+    compter('blasons_places', len(actifs))
+    return [os.path.join(logos_dir, filename) for filename in actifs]
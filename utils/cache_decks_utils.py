@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+
+from utils.assets_utils import images_projets, logos_blasons
+from utils.data_utils import preparer_valeurs
+from utils.image_utils import hash_source
+from utils.incremental_utils import RENDU_VERSION
+from utils.template_utils import hash_contenu
+
+# Journal des accès au cache, partagé entre processus : un octet par
+# événement, ajouté en fin de fichier (h : deck trouvé, m : absent, e : évincé)
+JOURNAL = 'statistiques.log'
+
+
+def cle_deck(data, df, placeholders_mapping, valeur_blason_active, img_dir, logos_dir, mapping_blasons, **options):
+    """
+    Clé d'un deck : empreinte SHA-256 du modèle, des colonnes utilisées des
+    lignes (dans l'ordre), du mapping, de la valeur blason, du contenu des
+    images projet et des logos référencés, et des `options` de rendu.
+    """
+    import pandas as pd
+    colonnes = sorted({col for col in placeholders_mapping.values() if col in df.columns}
+                      | {col for col in mapping_blasons if col in df.columns})
+    lignes = hashlib.sha256(pd.util.hash_pandas_object(df[colonnes], index=False).to_numpy().tobytes())
+
+    images = {}
+    if placeholders_mapping.get('IMAGE_PROJET'):
+        numeros = preparer_valeurs(df, {'IMAGE_PROJET': placeholders_mapping['IMAGE_PROJET']}, {})
+        index = images_projets(img_dir)
+        for numero in {ligne['IMAGE_PROJET'] for ligne in numeros}:
+            path = index.get(numero)
+            images[numero] = hash_source(path) if path else None
+    logos = logos_blasons(logos_dir)
+    elements = {
+        'version': RENDU_VERSION,
+        'modele': hash_contenu(data),
+        'colonnes': colonnes,
+        'lignes': [len(df), lignes.hexdigest()],
+        'mapping': placeholders_mapping,
+        'valeur_blason': valeur_blason_active,
+        'blasons': mapping_blasons,
+        'images': images,
+        'logos': {filename: hash_source(os.path.join(logos_dir, filename)) if filename in logos else None
+                  for filename in sorted(set(mapping_blasons.values()))},
+        'options': options,
+    }
+    contenu = json.dumps(elements, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+
+def _journaliser(dossier, evenements):
+    # Ajout en O_APPEND : pas de verrou, les écritures de plusieurs processus ne se mélangent pas
+    try:
+        os.makedirs(dossier, exist_ok=True)
+        fd = os.open(os.path.join(dossier, JOURNAL), os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, evenements.encode('ascii'))
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logging.getLogger(__name__).debug(f"Journal du cache des decks non écrit: {e}")
+
+
+def chercher_deck(dossier, cle):
+    """
+    Chemin du deck `cle` dans le cache, ou None. Un deck trouvé est marqué
+    comme le plus récemment servi (mtime) pour l'éviction LRU.
+    """
+    chemin = os.path.join(dossier, f"{cle}.pptx")
+    try:
+        os.utime(chemin)
+    except OSError:
+        _journaliser(dossier, 'm')
+        return None
+    _journaliser(dossier, 'h')
+    return chemin
+
+
+def stocker_deck(dossier, cle, source, max_octets, deplacer=False):
+    """
+    Ajoute au cache le deck `cle` (octets, ou chemin du fichier à copier,
+    ou à déplacer avec `deplacer` : fichier du même disque) puis évince
+    les decks les moins récemment servis tant que le cache dépasse
+    `max_octets`. Un deck plus gros que le cache n'est pas gardé.
+    """
+    taille = len(source) if isinstance(source, (bytes, bytearray, memoryview)) else os.path.getsize(source)
+    if taille > max_octets:
+        return
+    os.makedirs(dossier, exist_ok=True)
+    chemin = os.path.join(dossier, f"{cle}.pptx")
+    tmp = f"{chemin}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        if deplacer:
+            os.replace(source, chemin)
+        else:
+            if isinstance(source, (str, os.PathLike)):
+                shutil.copyfile(source, tmp)
+            else:
+                with open(tmp, 'wb') as f:
+                    f.write(source)
+            os.replace(tmp, chemin)
+    except OSError as e:
+        logging.getLogger(__name__).warning(f"Deck non mis en cache: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return
+    _evincer(dossier, max_octets, garder=chemin)
+
+
+def _decks(dossier):
+    # (mtime, taille, chemin) des decks du cache
+    try:
+        entrees = list(os.scandir(dossier))
+    except OSError:
+        return []
+    decks = []
+    for entree in entrees:
+        if entree.name.endswith('.pptx'):
+            try:
+                st = entree.stat()
+            except OSError:
+                continue
+            decks.append((st.st_mtime_ns, st.st_size, entree.path))
+    return decks
+
+
+def _evincer(dossier, max_octets, garder=None):
+    decks = sorted(_decks(dossier))
+    total = sum(taille for _, taille, _ in decks)
+    evinces = 0
+    for _, taille, chemin in decks:
+        if total <= max_octets:
+            break
+        if chemin == garder:
+            continue
+        try:
+            os.remove(chemin)
+        except OSError:
+            # Déjà évincé par un autre processus, ou ouvert (Windows)
+            continue
+        total -= taille
+        evinces += 1
+    if evinces:
+        _journaliser(dossier, 'e' * evinces)
+        logging.getLogger(__name__).info(f"Cache des decks : {evinces} deck(s) évincé(s)")
+
+
+def statistiques_decks(dossier):
+    """
+    Statistiques du cache des decks, tous processus confondus : decks
+    trouvés, absents, évincés, ratio de succès, decks et octets en cache.
+    """
+    try:
+        with open(os.path.join(dossier, JOURNAL), 'rb') as f:
+            journal = f.read()
+    except OSError:
+        journal = b''
+    decks = _decks(dossier)
+    trouves, absents = journal.count(b'h'), journal.count(b'm')
+    return {
+        'trouves': trouves,
+        'absents': absents,
+        'evinces': journal.count(b'e'),
+        'ratio': trouves / (trouves + absents) if trouves + absents else 0.0,
+        'decks': len(decks),
+        'octets': sum(taille for _, taille, _ in decks),
+    }
@@ -1,11 +1,11 @@
-import pandas as pd
-import numpy as np
+# pandas/numpy sont importés à l'usage : le module reste léger à importer
 
 def convertir_en_numerique(valeur):
     """
     Convertit une valeur en type numérique si possible,
     mais ignore les valeurs textuelles qui ne sont pas clairement numériques.
     """
+    import pandas as pd
     try:
         if isinstance(valeur, str) and (not valeur.replace('.', '', 1).replace(',', '', 1).isdigit()):
             return valeur
@@ -20,6 +20,8 @@ def formater_valeur(valeur, type_format=None):
     """
     Formate une valeur selon un type (monétaire, surface, date...).
     """
+    import pandas as pd
+    import numpy as np
     if pd.isna(valeur):
         return ''
     # On étend la reconnaissance aux types numpy.integer et numpy.floating
@@ -30,4 +32,85 @@ def formater_valeur(valeur, type_format=None):
         return f"{valeur:,} m²".replace(',', ' ')
     if isinstance(valeur, (pd.Timestamp, np.datetime64)):
         return pd.to_datetime(valeur).strftime('%d/%m/%Y')
-    return str(valeur)
\ No newline at end of file
+    return str(valeur)
+
+
+def appliquer_filtres(df, filtres):
+    """
+    Filtre un DataFrame : {colonne: [valeurs acceptées]}.
+    """
+    for colonne, valeurs in filtres.items():
+        df = df[df[colonne].isin(valeurs)]
+    return df
+
+def _formater_nombre(v, type_format):
+    # Même rendu que formater_valeur pour une valeur numérique
+    if type_format == 'monétaire':
+        return f"{v:,.2f} €".replace(',', ' ').replace('.', ',')
+    if type_format == 'surface':
+        return f"{v:,} m²".replace(',', ' ')
+    return str(v)
+
+
+def formater_colonne(serie, type_format=None):
+    """
+    Équivalent colonne par colonne de
+    formater_valeur(convertir_en_numerique(v), type_format) :
+    conversion numérique et formatage faits en une passe sur la Series.
+    Les colonnes datetime sont formatées en jj/mm/aaaa.
+    Renvoie une liste de chaînes.
+    """
+    import pandas as pd
+
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.strftime('%d/%m/%Y').fillna('').tolist()
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Colonne encodée : chaque catégorie n'est formatée qu'une fois
+        categories = formater_colonne(pd.Series(serie.cat.categories), type_format) + ['']
+        return [categories[code] for code in serie.cat.codes.tolist()]
+    if pd.api.types.is_bool_dtype(serie) or not (
+            pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_string_dtype(serie)):
+        return [formater_valeur(convertir_en_numerique(v), type_format) for v in serie]
+    if pd.api.types.is_numeric_dtype(serie):
+        return ['' if pd.isna(v) else _formater_nombre(v, type_format) for v in serie.tolist()]
+
+    # Colonne texte : seules les valeurs « clairement numériques » sont converties
+    valeurs = serie.tolist()
+    if not all(isinstance(v, str) or v is None or (isinstance(v, float) and v != v) for v in valeurs):
+        return [formater_valeur(convertir_en_numerique(v), type_format) for v in serie]
+    texte = serie.astype(object)
+    candidats = (texte.str.replace('.', '', n=1, regex=False)
+                 .str.replace(',', '', n=1, regex=False)
+                 .str.isdigit().fillna(False).astype(bool))
+    entiers = candidats & ~texte.str.contains('[.,]', regex=True).fillna(False).astype(bool)
+    flottants = candidats & ~entiers
+    nombres = pd.to_numeric(texte[candidats], errors='coerce')
+
+    resultat = ['' if (v is None or v != v) else v for v in valeurs]
+    for pos, (i, v) in zip(candidats.to_numpy().nonzero()[0], nombres.items()):
+        if v != v:
+            continue  # conversion impossible : texte conservé tel quel
+        resultat[pos] = _formater_nombre(int(v) if entiers.iat[pos] else float(v), type_format)
+    return resultat
+
+
+def preparer_valeurs(df, placeholders_mapping, types_formatage):
+    """
+    Plan de rendu : pour chaque ligne de `df`, le texte final de chaque
+    placeholder mappé, calculé colonne par colonne. La clé 'IMAGE_PROJET'
+    contient le numéro de projet (chiffres seuls) servant à trouver l'image.
+    Renvoie une liste de dicts, dans l'ordre des lignes.
+    """
+    colonnes = {}
+    for ph, col in placeholders_mapping.items():
+        if not col:
+            continue
+        if ph == 'IMAGE_PROJET':
+            serie = df[col].astype(str) if col in df.columns else None
+            colonnes[ph] = (serie.str.replace(r'\D', '', regex=True).fillna('').tolist()
+                            if serie is not None else [''] * len(df))
+        elif col in df.columns:
+            colonnes[ph] = formater_colonne(df[col], types_formatage.get(ph))
+        else:
+            colonnes[ph] = [''] * len(df)
+    return [dict(zip(colonnes, ligne)) for ligne in zip(*colonnes.values())] if colonnes else [{} for _ in range(len(df))]
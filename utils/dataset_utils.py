@@ -0,0 +1,268 @@
+import json
+import logging
+import os
+import re
+from io import BytesIO
+
+from config import MAPPING_BLASONS, PLACEHOLDERS_DEFAULT, TYPES_FORMATAGE
+from utils.template_utils import hash_contenu, lire_octets
+
+# Version du schéma inféré : à incrémenter si les règles d'inférence changent
+SCHEMA_VERSION = 1
+
+# Types de colonnes reconnus à l'ingestion
+TYPES_COLONNES = ['monetaire', 'surface', 'entier', 'decimal', 'date', 'drapeau', 'categorie', 'texte']
+
+# Part maximale de valeurs distinctes pour encoder une colonne texte en catégories
+SEUIL_CATEGORIE = 0.5
+
+# Ligne des en-têtes dans la feuille (1-based) : la première est un titre
+LIGNE_ENTETE = 2
+
+# Dates telles que lues avec dtype=str depuis une cellule date Excel
+_MOTIF_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}( \d{2}:\d{2}:\d{2})?$')
+
+
+def _colonnes_formatees():
+    """
+    Colonnes des placeholders à format monétaire / surface (config).
+    """
+    types = {}
+    for ph, type_format in TYPES_FORMATAGE.items():
+        col = PLACEHOLDERS_DEFAULT.get(ph)
+        if col:
+            types[col] = 'monetaire' if type_format == 'monétaire' else type_format
+    return types
+
+
+def _nombres(texte):
+    """
+    Conversion des valeurs « clairement numériques » (même règle que
+    convertir_en_numerique). Renvoie (nombres, entiers) ou None si une
+    valeur non vide ne se convertit pas.
+    """
+    import pandas as pd
+
+    candidats = (texte.str.replace('.', '', n=1, regex=False)
+                 .str.replace(',', '', n=1, regex=False).str.isdigit())
+    if not candidats.all():
+        return None
+    nombres = pd.to_numeric(texte, errors='coerce')
+    if nombres.isna().any():
+        return None
+    return nombres, not texte.str.contains('[.,]', regex=True).any()
+
+
+def inferer_type(nom, serie):
+    """
+    Type d'une colonne lue en texte : monetaire, surface, entier, decimal,
+    date, drapeau, categorie ou texte. Une colonne n'est typée que si toutes
+    ses valeurs non vides se convertissent sans perte de rendu.
+    """
+    if nom in MAPPING_BLASONS:
+        return 'drapeau'
+    valeurs = serie.dropna().astype(str).str.strip()
+    valeurs = valeurs[valeurs != '']
+    if valeurs.empty:
+        return 'texte'
+    formate = _colonnes_formatees().get(nom)
+    conversion = _nombres(valeurs)
+    if conversion is not None:
+        _, entiers = conversion
+        if formate == 'monetaire':
+            return 'monetaire'
+        # Les décimaux s'affichent différemment une fois typés (3 -> 3.0) :
+        # seules les colonnes entières sont converties
+        if entiers and not valeurs.str.match(r'^0\d').any():
+            return formate or 'entier'
+        return 'texte'
+    if valeurs.str.match(_MOTIF_DATE).all():
+        return 'date'
+    if valeurs.nunique() <= SEUIL_CATEGORIE * len(valeurs):
+        return 'categorie'
+    return 'texte'
+
+
+def inferer_schema(df):
+    """
+    Schéma {colonne: type} d'un DataFrame lu avec dtype=str.
+    """
+    return {col: inferer_type(col, df[col]) for col in df.columns}
+
+
+def typer_colonne(serie, type_colonne):
+    """
+    Convertit une colonne texte vers le dtype natif de son type.
+    """
+    import pandas as pd
+
+    if type_colonne in ('monetaire', 'surface', 'entier', 'decimal'):
+        nombres = pd.to_numeric(serie.where(serie.str.strip() != ''), errors='coerce')
+        entiere = nombres.dropna().mod(1).eq(0).all()
+        return nombres.astype('Int64' if entiere else 'Float64')
+    if type_colonne == 'date':
+        return pd.to_datetime(serie, format='ISO8601', errors='coerce')
+    if type_colonne in ('categorie', 'drapeau'):
+        return serie.astype('category')
+    return serie
+
+
+def appliquer_schema(df, schema):
+    """
+    DataFrame aux colonnes typées selon `schema` (les autres inchangées).
+    """
+    return df.assign(**{col: typer_colonne(df[col], schema[col]) for col in df.columns if col in schema})
+
+
+def _chemins_cache(cle, cache_dir):
+    base = os.path.join(cache_dir, 'datasets', f"{cle}.v{SCHEMA_VERSION}")
+    return f"{base}.parquet", f"{base}.schema.json"
+
+
+def _lire_sidecar(cle, cache_dir):
+    import pandas as pd
+
+    parquet, schema_json = _chemins_cache(cle, cache_dir)
+    if not (os.path.exists(parquet) and os.path.exists(schema_json)):
+        return None
+    try:
+        with open(schema_json, encoding='utf-8') as f:
+            schema = json.load(f)
+        df = pd.read_parquet(parquet)
+    except (OSError, ValueError, ImportError) as e:
+        logging.getLogger(__name__).warning(f"Cache classeur illisible, relecture: {e}")
+        return None
+    return df[list(schema)], schema
+
+
+def _ecrire_sidecar(cle, cache_dir, df, schema):
+    logger = logging.getLogger(__name__)
+    parquet, schema_json = _chemins_cache(cle, cache_dir)
+    try:
+        os.makedirs(os.path.dirname(parquet), exist_ok=True)
+        # Écriture atomique : le JSON est écrit en dernier, il valide le parquet
+        tmp = f"{parquet}.{os.getpid()}.tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, parquet)
+        tmp = f"{schema_json}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(schema, f, ensure_ascii=False)
+        os.replace(tmp, schema_json)
+    except ImportError:
+        logger.info("pyarrow absent : classeur typé gardé en mémoire seulement")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Impossible d'enregistrer le classeur typé: {e}")
+
+
+def charger_classeur(source, cache_dir=None, cle=None):
+    """
+    Lit le classeur de référence (chemin, flux ou octets), infère son schéma
+    et renvoie (DataFrame typé, schéma). Le résultat est mis en cache sous le
+    hash du fichier en Parquet dans `cache_dir` : un classeur déjà vu n'est
+    plus relu par openpyxl.
+    """
+    import pandas as pd
+
+    data = source if isinstance(source, bytes) else lire_octets(source)
+    cle = cle or hash_contenu(data)
+    resultat = _lire_sidecar(cle, cache_dir) if cache_dir else None
+    if resultat is None:
+        brut = pd.read_excel(BytesIO(data), header=LIGNE_ENTETE - 1, dtype=str)
+        schema = inferer_schema(brut)
+        df = appliquer_schema(brut, schema)
+        if cache_dir:
+            _ecrire_sidecar(cle, cache_dir, df, schema)
+        resultat = (df, schema)
+    return resultat
+
+
+def ajouter_ligne(df, valeurs, schema):
+    """
+    Ajoute une ligne saisie en texte à un DataFrame typé. Une colonne dont la
+    nouvelle valeur ne respecte pas le type repasse en texte.
+    Renvoie le nouveau DataFrame.
+    """
+    import pandas as pd
+
+    ligne = pd.DataFrame([valeurs], columns=df.columns, dtype=str)
+    df = df.copy()
+    for col in df.columns:
+        type_colonne = schema.get(col, 'texte')
+        texte = ligne[col].where(ligne[col].str.strip() != '')
+        if type_colonne in ('categorie', 'drapeau'):
+            nouvelles = [v for v in texte.dropna() if v not in df[col].cat.categories]
+            df[col] = df[col].cat.add_categories(nouvelles)
+            ligne[col] = texte.astype(df[col].dtype)
+            continue
+        if type_colonne == 'texte':
+            # Saisie vide : valeur manquante, comme une cellule vide à la lecture
+            ligne[col] = texte
+            continue
+        typee = typer_colonne(texte, type_colonne)
+        try:
+            conforme = typee.isna().sum() == texte.isna().sum()
+            typee = typee.astype(df[col].dtype)
+        except (TypeError, ValueError):
+            conforme = False
+        if conforme:
+            ligne[col] = typee
+        else:
+            # Valeur non conforme : la colonne repasse en texte
+            df[col] = df[col].astype(str).where(df[col].notna())
+            schema[col] = 'texte'
+    return pd.concat([df, ligne], ignore_index=True)
+
+
+def _valeur_cellule(valeur):
+    """
+    Valeur d'un DataFrame typé convertie pour une cellule openpyxl.
+    """
+    import pandas as pd
+
+    if pd.isna(valeur):
+        return None
+    if isinstance(valeur, pd.Timestamp):
+        return valeur.to_pydatetime()
+    if hasattr(valeur, 'item'):
+        return valeur.item()
+    return valeur if isinstance(valeur, (int, float)) else str(valeur)
+
+
+def ajouter_lignes_classeur(data, lignes, df=None, schema=None, cache_dir=None):
+    """
+    Ajoute les lignes `lignes` (DataFrame typé aux colonnes du classeur) à la
+    fin de la première feuille du classeur `data` (octets), en un seul
+    enregistrement et sans réécrire le reste : ligne de titre, en-têtes et
+    styles sont conservés, les nouvelles lignes reprennent le style de la
+    dernière ligne remplie.
+    Si `df` (classeur complet, lignes ajoutées comprises) et `schema` sont
+    fournis, ils sont mis en cache sous le hash du nouveau classeur, qui ne
+    sera donc pas relu. Renvoie les octets du nouveau classeur.
+    """
+    from copy import copy
+    from openpyxl import load_workbook
+
+    wb = load_workbook(BytesIO(data))
+    ws = wb.worksheets[0]
+    colonnes = {cell.value: cell.column for cell in ws[LIGNE_ENTETE] if cell.value is not None}
+    derniere = ws.max_row
+    while derniere > LIGNE_ENTETE and all(cell.value is None for cell in ws[derniere]):
+        derniere -= 1
+    modele = {cell.column: cell for cell in ws[derniere]} if derniere > LIGNE_ENTETE else {}
+    hauteur = ws.row_dimensions[derniere].height if modele else None
+    for n, ligne in enumerate(lignes.itertuples(index=False), derniere + 1):
+        for col, valeur in zip(lignes.columns, ligne):
+            if col not in colonnes:
+                continue
+            cell = ws.cell(row=n, column=colonnes[col], value=_valeur_cellule(valeur))
+            if colonnes[col] in modele and modele[colonnes[col]].has_style:
+                cell._style = copy(modele[colonnes[col]]._style)
+        if hauteur is not None:
+            ws.row_dimensions[n].height = hauteur
+    buf = BytesIO()
+    wb.save(buf)
+    nouveau = buf.getvalue()
+    if df is not None and schema is not None and cache_dir:
+        _ecrire_sidecar(hash_contenu(nouveau), cache_dir, df, schema)
+    logging.getLogger(__name__).info(f"{len(lignes)} ligne(s) ajoutée(s) au classeur (lignes {derniere + 1} et suivantes)")
+    return nouveau
@@ -0,0 +1,34 @@
+import zipfile
+
+# Médias déjà compressés : stockés tels quels, le deflate n'y gagne rien
+EXTENSIONS_COMPRESSEES = {
+    'jpg', 'jpeg', 'png', 'gif', 'tif', 'tiff', 'wdp', 'jxr',
+    'mp3', 'mp4', 'm4a', 'm4v', 'mov', 'wmv', 'wma', 'avi', 'zip',
+}
+
+
+def ecrire_pptx(prs, destination, niveau_compression=6):
+    """
+    Écrit la présentation directement dans `destination` (chemin ou flux
+    binaire, éventuellement non seekable), sans passer par un BytesIO.
+    Les parts XML sont compressées avec `niveau_compression` (0-9), les
+    médias déjà compressés (JPEG, PNG...) sont stockés sans compression.
+    """
+    from pptx.opc.oxml import serialize_part_xml
+    from pptx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+    from pptx.opc.serialized import _ContentTypesItem
+
+    package = prs.part.package
+    parts = tuple(package.iter_parts())
+    with zipfile.ZipFile(destination, 'w', compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=niveau_compression, strict_timestamps=False) as zf:
+        zf.writestr(CONTENT_TYPES_URI.membername, serialize_part_xml(_ContentTypesItem.xml_for(parts)))
+        zf.writestr(PACKAGE_URI.rels_uri.membername, package._rels.xml)
+        for part in parts:
+            if part.partname.ext.lower() in EXTENSIONS_COMPRESSEES:
+                zf.writestr(part.partname.membername, part.blob, compress_type=zipfile.ZIP_STORED)
+            else:
+                zf.writestr(part.partname.membername, part.blob)
+            if part._rels:
+                zf.writestr(part.partname.rels_uri.membername, part.rels.xml)
+    return destination
@@ -0,0 +1,133 @@
+# Index inversé valeur -> lignes pour les filtres de l'interface.
+# Chaque ensemble de lignes est un bitmap stocké dans un int Python :
+# bit i à 1 si la ligne i (position) porte la valeur. ET / OU et comptages
+# (int.bit_count) se font sans toucher au DataFrame.
+
+# Nombre maximal de valeurs distinctes pour indexer une colonne
+MAX_VALEURS_INDEX = 256
+
+
+def _bitmap(masque):
+    """
+    Bitmap (int) d'un masque booléen numpy.
+    """
+    import numpy as np
+    return int.from_bytes(np.packbits(masque, bitorder='little').tobytes(), 'little')
+
+
+def positions(bitmap, n):
+    """
+    Positions (array numpy croissant) des bits à 1 d'un bitmap de `n` lignes.
+    """
+    import numpy as np
+    octets = bitmap.to_bytes((n + 7) // 8, 'little')
+    return np.flatnonzero(np.unpackbits(np.frombuffer(octets, dtype=np.uint8), bitorder='little')[:n])
+
+
+def indexer_colonne(serie):
+    """
+    {valeur: bitmap} d'une colonne, ou None si elle a trop de valeurs
+    distinctes. Les valeurs manquantes ne sont pas indexées.
+    """
+    import pandas as pd
+
+    codes, valeurs = pd.factorize(serie)
+    if len(valeurs) > MAX_VALEURS_INDEX:
+        return None
+    return {valeur: _bitmap(codes == k) for k, valeur in enumerate(valeurs)}
+
+
+def construire_index(df):
+    """
+    Index des colonnes de faible cardinalité d'un DataFrame :
+    {'n': nombre de lignes, 'colonnes': {colonne: {valeur: bitmap}},
+    'types': {colonne: dtype}}.
+    """
+    colonnes = {}
+    for col in df.columns:
+        index_col = indexer_colonne(df[col])
+        if index_col is not None:
+            colonnes[col] = index_col
+    return {'n': len(df), 'colonnes': colonnes, 'types': _types(df)}
+
+
+def _types(df):
+    return {col: str(dtype) for col, dtype in df.dtypes.items()}
+
+
+def etendre_index(index, df):
+    """
+    Index de `df` à partir de celui de ses `index['n']` premières lignes,
+    quand des lignes ont été ajoutées à la fin : seules les nouvelles
+    lignes sont lues. Une colonne qui dépasse MAX_VALEURS_INDEX valeurs
+    sort de l'index. Une colonne dont le type a changé (passée en texte par
+    ajouter_ligne) est réindexée entièrement. Renvoie un nouvel index.
+    """
+    import pandas as pd
+
+    if 'types' not in index:
+        return construire_index(df)
+    types = _types(df)
+    colonnes = {}
+    for col in types:
+        if types[col] != index['types'].get(col):
+            index_col = indexer_colonne(df[col])
+            if index_col is not None:
+                colonnes[col] = index_col
+    for col, bitmaps in index['colonnes'].items():
+        if types.get(col) != index['types'].get(col):
+            continue
+        bitmaps = dict(bitmaps)
+        for position, valeur in enumerate(df[col].iloc[index['n']:], index['n']):
+            if not pd.isna(valeur):
+                bitmaps[valeur] = bitmaps.get(valeur, 0) | (1 << position)
+        if len(bitmaps) <= MAX_VALEURS_INDEX:
+            colonnes[col] = bitmaps
+    return {'n': len(df), 'colonnes': colonnes, 'types': types}
+
+
+def _bitmap_filtre(index, df, colonne, valeurs):
+    """
+    OU des bitmaps des valeurs acceptées ; colonne non indexée : isin.
+    """
+    bitmaps = index['colonnes'].get(colonne)
+    if bitmaps is None:
+        return _bitmap(df[colonne].isin(valeurs).to_numpy())
+    resultat = 0
+    for valeur in valeurs:
+        resultat |= bitmaps.get(valeur, 0)
+    return resultat
+
+
+def bitmap_filtres(index, df, filtres):
+    """
+    Bitmap des lignes vérifiant tous les filtres {colonne: [valeurs]}
+    (ET entre colonnes, OU entre valeurs d'une colonne).
+    """
+    resultat = (1 << index['n']) - 1
+    for colonne, valeurs in filtres.items():
+        resultat &= _bitmap_filtre(index, df, colonne, valeurs)
+    return resultat
+
+
+def lignes_filtrees(index, df, filtres):
+    """
+    Positions des lignes retenues par `filtres`, sans copie du DataFrame.
+    """
+    return positions(bitmap_filtres(index, df, filtres), index['n'])
+
+
+def comptes_valeurs(index, df, colonne, filtres=None):
+    """
+    Pour chaque valeur de `colonne`, nombre de lignes gardées si on la
+    sélectionne en plus de `filtres` (les filtres sur `colonne` elle-même
+    sont ignorés). Renvoie {valeur: nombre}.
+    """
+    autres = {c: v for c, v in (filtres or {}).items() if c != colonne}
+    base = bitmap_filtres(index, df, autres)
+    bitmaps = index['colonnes'].get(colonne)
+    if bitmaps is None:
+        # Colonne non indexée : comptage sur les seules lignes retenues
+        comptes = df[colonne].iloc[positions(base, index['n'])].value_counts()
+        return {valeur: comptes.get(valeur, 0) for valeur in df[colonne].dropna().unique()}
+    return {valeur: (base & bitmap).bit_count() for valeur, bitmap in bitmaps.items()}
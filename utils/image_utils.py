@@ -1,33 +1,135 @@
 import os
+import hashlib
 import logging
-from PIL import Image
+import threading
+from io import BytesIO
+from utils.instrumentation_utils import compter
 
-def creer_image_transparente(chemin='transparent.png', taille=(100,100)):
+# 1 pouce = 914400 EMU
+EMU_PAR_POUCE = 914400
+
+# Empreintes des sources déjà lues : (chemin, mtime, taille) -> sha256
+_HASH_SOURCES = {}
+
+
+def hash_source(image_path):
     """
-    Crée une image transparente pour remplacer les blasons inactifs.
+    Empreinte SHA-256 d'un fichier image, mémorisée tant que le fichier
+    ne change pas (mtime, taille).
+    """
+    st = os.stat(image_path)
+    cle = (image_path, st.st_mtime_ns, st.st_size)
+    if cle not in _HASH_SOURCES:
+        with open(image_path, 'rb') as f:
+            _HASH_SOURCES[cle] = hashlib.sha256(f.read()).hexdigest()
+    return _HASH_SOURCES[cle]
+
+
+def preparer_image(image_path, largeur_emu, hauteur_emu, dpi=150, qualite=85, cache_dir=None):
     """
+    Réduit une image à la taille de sa zone cible (en EMU) pour la résolution
+    `dpi`, et la réencode (JPEG avec `qualite`, PNG si transparence).
+    Le résultat est mis en cache dans `cache_dir` sous le hash de la source
+    et la taille cible. Renvoie un chemin ou un flux utilisable par add_picture ;
+    l'image d'origine est renvoyée si elle est déjà assez petite.
+    """
+    from PIL import Image
+    logger = logging.getLogger(__name__)
+    cible = (max(1, round(largeur_emu / EMU_PAR_POUCE * dpi)),
+             max(1, round(hauteur_emu / EMU_PAR_POUCE * dpi)))
+    cle = f"{hash_source(image_path)}_{cible[0]}x{cible[1]}_q{qualite}"
+    if cache_dir:
+        for ext in ('jpg', 'png'):
+            chemin = os.path.join(cache_dir, f"{cle}.{ext}")
+            if os.path.exists(chemin):
+                compter('images_reduites_cache')
+                return chemin
+
     try:
-        img = Image.new('RGBA', taille, (255,255,255,0))
-        img.save(chemin)
-        return chemin
+        with Image.open(image_path) as img:
+            if img.width <= cible[0] and img.height <= cible[1]:
+                return image_path
+            transparente = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+            img = img.convert('RGBA' if transparente else 'RGB')
+            img = img.resize((min(cible[0], img.width), min(cible[1], img.height)), Image.LANCZOS)
     except Exception as e:
-        logging.getLogger(__name__).warning(f"Erreur création image transparente: {e}")
-        return None
+        logger.warning(f"Erreur réduction image {image_path}: {e}")
+        return image_path
+
+    compter('images_reduites')
+    ext = 'png' if transparente else 'jpg'
+    buf = BytesIO()
+    if transparente:
+        img.save(buf, format='PNG', optimize=True)
+    else:
+        img.save(buf, format='JPEG', quality=qualite, optimize=True)
+    if cache_dir:
+        chemin = os.path.join(cache_dir, f"{cle}.{ext}")
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{chemin}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(buf.getvalue())
+            os.replace(tmp, chemin)
+            return chemin
+        except OSError as e:
+            logger.warning(f"Impossible d'enregistrer l'image réduite: {e}")
+    buf.seek(0)
+    return buf
+
+
+def charger_image(image_path, largeur_emu, hauteur_emu, dpi=None, qualite=85, cache_dir=None):
+    """
+    Octets de l'image à insérer dans une zone de (largeur_emu, hauteur_emu),
+    réduite si `dpi` est fourni (voir preparer_image), et nom servant de
+    description (None pour une image réduite en mémoire).
+    Renvoie (octets, nom) ; utilisé par le préchargement, hors de la slide.
+    """
+    source = preparer_image(image_path, largeur_emu, hauteur_emu, dpi, qualite, cache_dir) if dpi else image_path
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read(), os.path.basename(source)
+    return source.getvalue(), None
 
 
-def remplacer_image(slide, placeholder_name, image_path):
+def ajouter_picture(slide, octets, nom, left, top, width, height):
+    """
+    add_picture à partir d'octets déjà lus : même part image (dédoublonnée
+    par SHA-1) et même description que add_picture(chemin) si `nom` est le
+    nom du fichier.
+    """
+    from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+    from pptx.parts.image import Image, ImagePart
+    package = slide.part.package
+    image = Image.from_blob(octets, nom)
+    image_part = package._image_parts._find_by_sha1(image.sha1) or ImagePart.new(package, image)
+    rId = slide.part.relate_to(image_part, RT.IMAGE)
+    shapes = slide.shapes
+    pic = shapes._add_pic_from_image_part(image_part, rId, left, top, width, height)
+    shapes._recalculate_extents()
+    return shapes._shape_factory(pic)
+
+
+def remplacer_image(slide, placeholder_name, image_path, cible=None, dpi=None, qualite=85, cache_dir=None,
+                    image=None):
     """
     Remplace un placeholder d'image par un fichier existant.
+    `cible` permet de fournir directement la shape à remplacer (index modèle).
+    Si `dpi` est fourni, l'image est réduite à la taille de la zone
+    (voir preparer_image).
+    `image` : (octets, nom) déjà chargés par le préchargement (voir
+    charger_image) ; le fichier n'est alors pas relu.
     """
     logger = logging.getLogger(__name__)
-    if not os.path.exists(image_path):
+    if image is None and not os.path.exists(image_path):
         logger.warning(f"Image non trouvée: {image_path}")
         return False
-    target = None
-    for shp in slide.shapes:
-        if getattr(shp, 'name', '') == placeholder_name:
-            target = shp
-            break
+    target = cible
+    if not target:
+        for shp in slide.shapes:
+            if getattr(shp, 'name', '') == placeholder_name:
+                target = shp
+                break
     if not target:
         for shp in slide.shapes:
             if shp.shape_type == 13:  # picture
@@ -40,9 +142,15 @@ def remplacer_image(slide, placeholder_name, image_path):
     el = target._element
     parent = el.getparent()
     parent.remove(el)
-    pic = slide.shapes.add_picture(image_path, left, top, width, height)
+    if image is not None:
+        pic = ajouter_picture(slide, *image, left, top, width, height)
+    else:
+        if dpi:
+            image_path = preparer_image(image_path, width, height, dpi, qualite, cache_dir)
+        pic = slide.shapes.add_picture(image_path, left, top, width, height)
+    compter('images_octets', len(pic.image.blob))
     try:
         pic.name = placeholder_name
     except:
         pass
-    return True
\ No newline at end of file
+    return True
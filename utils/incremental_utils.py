@@ -0,0 +1,53 @@
+import hashlib
+import json
+import logging
+import os
+
+# Version du rendu : à incrémenter si la génération d'une slide change,
+# pour invalider les manifestes existants
+RENDU_VERSION = 1
+
+
+def chemin_manifeste(sortie):
+    """
+    Manifeste associé à un fichier de sortie : deck.pptx -> deck.manifest.json
+    """
+    return os.path.splitext(sortie)[0] + '.manifest.json'
+
+
+def charger_manifeste(sortie):
+    """
+    Renvoie le manifeste de la génération précédente de `sortie`, ou None.
+    """
+    chemin = chemin_manifeste(sortie)
+    if not (os.path.exists(chemin) and os.path.exists(sortie)):
+        return None
+    try:
+        with open(chemin, encoding='utf-8') as f:
+            manifeste = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.getLogger(__name__).warning(f"Manifeste illisible, régénération complète: {e}")
+        return None
+    if manifeste.get('version') != RENDU_VERSION:
+        return None
+    return manifeste
+
+
+def ecrire_manifeste(sortie, manifeste):
+    """
+    Enregistre le manifeste à côté de `sortie` (écriture atomique).
+    """
+    chemin = chemin_manifeste(sortie)
+    tmp = f"{chemin}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifeste, f, ensure_ascii=False)
+    os.replace(tmp, chemin)
+
+
+def empreinte_slide(**elements):
+    """
+    Empreinte SHA-256 de tout ce qui détermine le rendu d'une slide
+    (modèle, valeurs, mapping, image, blasons, options).
+    """
+    data = json.dumps(elements, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
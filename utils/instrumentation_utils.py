@@ -0,0 +1,146 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+# Rapport en cours de collecte pour ce thread / cette session (None : inactif)
+_RAPPORT = contextvars.ContextVar('rapport_generation', default=None)
+
+# Nombre de lignes gardées dans les profils CPU et mémoire
+LIGNES_PROFIL = 30
+
+
+@contextmanager
+def collecter(rapport=None, profil_cpu=False, profil_memoire=False):
+    """
+    Active la collecte des mesures (étapes, compteurs, slides) dans `rapport`
+    (dict, créé si absent) pendant le bloc. Optionnellement, capture un
+    profil cProfile et/ou tracemalloc, ajoutés au rapport en texte/JSON.
+    """
+    rapport = rapport if rapport is not None else {}
+    rapport.update({'etapes': {}, 'compteurs': {}, 'slides': []})
+    jeton = _RAPPORT.set(rapport)
+    profil = None
+    trace_demarree = False
+    if profil_memoire:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            trace_demarree = True
+        tracemalloc.reset_peak()
+    if profil_cpu:
+        import cProfile
+        profil = cProfile.Profile()
+        profil.enable()
+    debut = time.perf_counter()
+    try:
+        yield rapport
+    finally:
+        rapport['secondes'] = round(time.perf_counter() - debut, 6)
+        if profil is not None:
+            profil.disable()
+            rapport['profil_cpu'] = _texte_profil(profil)
+        if profil_memoire:
+            rapport['profil_memoire'] = _resume_memoire()
+            if trace_demarree:
+                tracemalloc.stop()
+        _RAPPORT.reset(jeton)
+
+
+def _texte_profil(profil):
+    import io
+    import pstats
+    flux = io.StringIO()
+    pstats.Stats(profil, stream=flux).sort_stats('cumulative').print_stats(LIGNES_PROFIL)
+    return flux.getvalue()
+
+
+def _resume_memoire():
+    import tracemalloc
+    courant, pic = tracemalloc.get_traced_memory()
+    stats = tracemalloc.take_snapshot().statistics('lineno')[:LIGNES_PROFIL]
+    return {
+        'courant_mo': round(courant / 2**20, 3),
+        'pic_mo': round(pic / 2**20, 3),
+        'allocations': [{'ligne': str(s.traceback), 'ko': round(s.size / 1024, 1), 'blocs': s.count}
+                        for s in stats],
+    }
+
+
+def actif():
+    return _RAPPORT.get() is not None
+
+
+@contextmanager
+def etape(nom):
+    """
+    Chronomètre le bloc et cumule sa durée sous `nom` (no-op si inactif).
+    """
+    rapport = _RAPPORT.get()
+    if rapport is None:
+        yield
+        return
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        mesure = rapport['etapes'].setdefault(nom, {'secondes': 0.0, 'appels': 0})
+        mesure['secondes'] += time.perf_counter() - debut
+        mesure['appels'] += 1
+
+
+def compter(nom, n=1):
+    """
+    Incrémente le compteur `nom` (no-op si inactif).
+    """
+    rapport = _RAPPORT.get()
+    if rapport is not None:
+        rapport['compteurs'][nom] = rapport['compteurs'].get(nom, 0) + n
+
+
+def enregistrer_slide(position, debut, **infos):
+    """
+    Ajoute la durée de rendu d'une slide (depuis `debut`, perf_counter).
+    """
+    rapport = _RAPPORT.get()
+    if rapport is not None:
+        rapport['slides'].append({'position': position,
+                                  'secondes': round(time.perf_counter() - debut, 6), **infos})
+
+
+def fusionner(mesures, sauf=()):
+    """
+    Ajoute au rapport actif les mesures collectées dans un autre processus
+    (lot du rendu parallèle) : durées d'étapes, compteurs hors `sauf`, slides.
+    """
+    rapport = _RAPPORT.get()
+    if rapport is None:
+        return
+    for nom, mesure in mesures['etapes'].items():
+        cumul = rapport['etapes'].setdefault(nom, {'secondes': 0.0, 'appels': 0})
+        cumul['secondes'] += mesure['secondes']
+        cumul['appels'] += mesure['appels']
+    for nom, n in mesures['compteurs'].items():
+        if nom not in sauf:
+            compter(nom, n)
+    rapport['slides'].extend(mesures['slides'])
+
+
+def lignes_tableau(rapport):
+    """
+    Rapport aplati en lignes (Catégorie, Mesure, Valeur) pour affichage.
+    """
+    lignes = [{'Catégorie': 'total', 'Mesure': 'durée (s)', 'Valeur': round(rapport.get('secondes', 0), 4)}]
+    for nom, mesure in sorted(rapport.get('etapes', {}).items(), key=lambda e: -e[1]['secondes']):
+        lignes.append({'Catégorie': 'étape', 'Mesure': f"{nom} (s, {mesure['appels']} appel(s))",
+                       'Valeur': round(mesure['secondes'], 4)})
+    for nom, valeur in sorted(rapport.get('compteurs', {}).items()):
+        lignes.append({'Catégorie': 'compteur', 'Mesure': nom, 'Valeur': valeur})
+    slides = rapport.get('slides', [])
+    if slides:
+        durees = [s['secondes'] for s in slides]
+        lignes.append({'Catégorie': 'slides', 'Mesure': 'durée moyenne (s)',
+                       'Valeur': round(sum(durees) / len(durees), 4)})
+        lignes.append({'Catégorie': 'slides', 'Mesure': 'durée max (s)', 'Valeur': round(max(durees), 4)})
+    if 'profil_memoire' in rapport:
+        lignes.append({'Catégorie': 'mémoire', 'Mesure': 'pic (Mo)', 'Valeur': rapport['profil_memoire']['pic_mo']})
+    return lignes
@@ -0,0 +1,599 @@
+# Moteur de rendu « XML brut » : le modèle est ouvert comme une archive zip,
+# les slides sont modifiées directement avec lxml et les parts réécrites
+# telles quelles, sans les objets proxy de python-pptx. Les conventions de
+# nommage (rId, parts, ids de shapes) reprennent celles de python-pptx pour
+# produire le même contenu que le moteur par défaut.
+
+import copy
+import hashlib
+import logging
+import os
+import posixpath
+import re
+import zipfile
+from io import BytesIO
+
+from utils.export_utils import EXTENSIONS_COMPRESSEES
+from utils.instrumentation_utils import compter
+from utils.text_utils import substituer_placeholders
+
+NS = {
+    'p': 'http://schemas.openxmlformats.org/presentationml/2006/main',
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+}
+NS_RELS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+NS_TYPES = 'http://schemas.openxmlformats.org/package/2006/content-types'
+
+RT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+RT_DOCUMENT = RT + 'officeDocument'
+RT_SLIDE = RT + 'slide'
+RT_IMAGE = RT + 'image'
+RT_NOTES = RT + 'notesSlide'
+
+CT_SLIDE = 'application/vnd.openxmlformats-officedocument.presentationml.slide+xml'
+CT_RELS = 'application/vnd.openxmlformats-package.relationships+xml'
+CT_XML = 'application/xml'
+
+# Types MIME des images, par extension de part (celle choisie par python-pptx)
+TYPES_IMAGES = {'png': 'image/png', 'jpg': 'image/jpeg', 'gif': 'image/gif',
+                'bmp': 'image/bmp', 'tiff': 'image/tiff'}
+
+# (extension, type) déclarés en Default plutôt qu'en Override, comme python-pptx
+DEFAULTS = {
+    ('bmp', 'image/bmp'), ('emf', 'image/x-emf'), ('fntdata', 'application/x-fontdata'),
+    ('gif', 'image/gif'), ('jpe', 'image/jpeg'), ('jpeg', 'image/jpeg'), ('jpg', 'image/jpeg'),
+    ('mov', 'video/quicktime'), ('mp4', 'video/mp4'), ('mpg', 'video/mpeg'), ('png', 'image/png'),
+    ('rels', CT_RELS), ('tif', 'image/tiff'), ('tiff', 'image/tiff'), ('vid', 'video/unknown'),
+    ('wdp', 'image/vnd.ms-photo'), ('wmf', 'image/x-wmf'), ('wmv', 'video/x-ms-wmv'),
+    ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'), ('xml', CT_XML),
+    ('bin', 'application/vnd.openxmlformats-officedocument.presentationml.printerSettings'),
+}
+
+# Éléments du spTree comptés comme shapes (même ordre que slide.shapes)
+BALISES_FORMES = {f"{{{NS['p']}}}{nom}" for nom in
+                  ('sp', 'grpSp', 'graphicFrame', 'cxnSp', 'pic', 'contentPart')}
+
+# Modèle p:pic identique à celui de python-pptx (CT_Picture.new_pic)
+_MODELE_PIC = (
+    '<p:pic xmlns:a="{a}" xmlns:p="{p}" xmlns:r="{r}">'
+    '<p:nvPicPr><p:cNvPr id="0" name="" descr=""/><p:cNvPicPr><a:picLocks noChangeAspect="1"/>'
+    '</p:cNvPicPr><p:nvPr/></p:nvPicPr><p:blipFill><a:blip r:embed=""/><a:stretch><a:fillRect/>'
+    '</a:stretch></p:blipFill><p:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/></a:xfrm>'
+    '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></p:spPr></p:pic>'
+).format(**NS)
+
+_PARSER = None
+
+
+def _q(nom):
+    prefixe, local = nom.split(':')
+    return f"{{{NS[prefixe]}}}{local}"
+
+
+def _parser():
+    global _PARSER
+    if _PARSER is None:
+        from lxml import etree
+        _PARSER = etree.XMLParser(remove_blank_text=True, resolve_entities=False)
+    return _PARSER
+
+
+def _parse(octets):
+    from lxml import etree
+    return etree.fromstring(octets, _parser())
+
+
+def _serialiser(element):
+    from lxml import etree
+    return etree.tostring(element, encoding='UTF-8', standalone=True)
+
+
+def _nom_rels(partname):
+    dossier, base = posixpath.split(partname)
+    return posixpath.join(dossier, '_rels', f"{base}.rels")
+
+
+# --- Paquet OPC ---
+
+def ouvrir_paquet(data):
+    """
+    Ouvre un PPTX (octets) : parts brutes par nom, types de contenu,
+    relations et XML chargés à la demande.
+    """
+    with zipfile.ZipFile(BytesIO(data)) as zf:
+        membres = {'/' + info.filename: zf.read(info) for info in zf.infolist()}
+    types = _parse(membres['/[Content_Types].xml'])
+    paquet = {
+        'membres': membres,
+        'xml': {},
+        'rels': {},
+        'defaults': {el.get('Extension').lower(): el.get('ContentType')
+                     for el in types.iter(f'{{{NS_TYPES}}}Default')},
+        'overrides': {el.get('PartName'): el.get('ContentType')
+                      for el in types.iter(f'{{{NS_TYPES}}}Override')},
+        'medias': None,
+        'renommer_slides': False,
+        # Caches des ajouts de slides : XML et relations prêts à cloner par
+        # slide source, premier rId libre par part, dernier id de sldIdLst
+        'clones': {},
+        'rids_libres': {},
+        'dernier_sld_id': None,
+    }
+    paquet['presentation'] = next(cible for _, (type_rel, cible, _) in relations(paquet, '/').items()
+                                  if type_rel == RT_DOCUMENT)
+    return paquet
+
+
+def type_part(paquet, partname):
+    if partname in paquet['overrides']:
+        return paquet['overrides'][partname]
+    return paquet['defaults'].get(partname.rpartition('.')[2].lower())
+
+
+def xml_part(paquet, partname):
+    """
+    Élément racine d'une part XML (parsé une fois, réécrit à l'enregistrement).
+    """
+    if partname not in paquet['xml']:
+        paquet['xml'][partname] = _parse(paquet['membres'][partname])
+    return paquet['xml'][partname]
+
+
+def relations(paquet, partname):
+    """
+    Relations d'une part : {rId: (type, cible absolue ou URL, externe)}.
+    """
+    if partname not in paquet['rels']:
+        rels = {}
+        membre = paquet['membres'].get('/_rels/.rels' if partname == '/' else _nom_rels(partname))
+        if membre is not None:
+            base = posixpath.dirname(partname) if partname != '/' else '/'
+            for el in _parse(membre).iter(f'{{{NS_RELS}}}Relationship'):
+                externe = el.get('TargetMode') == 'External'
+                cible = el.get('Target')
+                if not externe:
+                    cible = posixpath.normpath(posixpath.join(base, cible))
+                rels[el.get('Id')] = (el.get('Type'), cible, externe)
+        paquet['rels'][partname] = rels
+    return paquet['rels'][partname]
+
+
+def ajouter_relation(paquet, source, type_rel, cible, externe=False):
+    """
+    rId d'une relation de `source` vers `cible`, créée si besoin
+    (premier rIdN libre, comme python-pptx).
+    """
+    rels = relations(paquet, source)
+    for rId, rel in rels.items():
+        if rel == (type_rel, cible, externe):
+            return rId
+    rId = _rid_libre(paquet, source)
+    rels[rId] = (type_rel, cible, externe)
+    return rId
+
+
+def _rid_libre(paquet, source):
+    # Tant qu'aucune relation n'est retirée, les rId sous le dernier attribué restent pris
+    rels = relations(paquet, source)
+    n = paquet['rids_libres'].get(source, 1)
+    while f"rId{n}" in rels:
+        n += 1
+    paquet['rids_libres'][source] = n + 1
+    return f"rId{n}"
+
+
+def _liste_slides(paquet):
+    return xml_part(paquet, paquet['presentation']).find(_q('p:sldIdLst'))
+
+
+def slides(paquet):
+    """
+    Noms des parts de slides, dans l'ordre de la présentation.
+    """
+    rels = relations(paquet, paquet['presentation'])
+    return [rels[sld.get(_q('r:id'))][1] for sld in _liste_slides(paquet)]
+
+
+def tailles_slides(data):
+    """
+    Taille compressée de chaque slide du PPTX `data` (XML et relations),
+    dans l'ordre de la présentation : seuls le répertoire du zip et
+    presentation.xml sont lus.
+    """
+    with zipfile.ZipFile(BytesIO(data)) as zf:
+        tailles = {'/' + info.filename: info.compress_size for info in zf.infolist()}
+        paquet = {'membres': {'/_rels/.rels': zf.read('_rels/.rels')}, 'xml': {}, 'rels': {}}
+        paquet['presentation'] = next(cible for type_rel, cible, _ in relations(paquet, '/').values()
+                                      if type_rel == RT_DOCUMENT)
+        for nom in (paquet['presentation'], _nom_rels(paquet['presentation'])):
+            paquet['membres'][nom] = zf.read(nom[1:])
+    return [tailles[nom] + tailles.get(_nom_rels(nom), 0) for nom in slides(paquet)]
+
+
+def _ajouter_slide(paquet, element):
+    """
+    Enregistre une nouvelle part de slide (XML `element`, ou ses octets déjà
+    sérialisés) en fin de présentation.
+    """
+    from lxml import etree
+    sld_lst = _liste_slides(paquet)
+    n = len(sld_lst) + 1
+    while f"/ppt/slides/slide{n}.xml" in paquet['membres'] or f"/ppt/slides/slide{n}.xml" in paquet['xml']:
+        n += 1
+    partname = f"/ppt/slides/slide{n}.xml"
+    if isinstance(element, bytes):
+        paquet['membres'][partname] = element
+    else:
+        paquet['xml'][partname] = element
+    paquet['rels'][partname] = {}
+    paquet['overrides'][partname] = CT_SLIDE
+    # Part neuve : pas de relation existante à rechercher
+    rId = _rid_libre(paquet, paquet['presentation'])
+    relations(paquet, paquet['presentation'])[rId] = (RT_SLIDE, partname, False)
+    if paquet['dernier_sld_id'] is None:
+        paquet['dernier_sld_id'] = max([255] + [int(s.get('id')) for s in sld_lst])
+    paquet['dernier_sld_id'] += 1
+    etree.SubElement(sld_lst, _q('p:sldId'), {'id': str(paquet['dernier_sld_id']), _q('r:id'): rId})
+    return partname
+
+
+def cloner_slide(paquet, source):
+    """
+    Clone la slide `source` en fin de présentation : XML copié, relations
+    (layout, médias) reportées vers les mêmes parts, notes exclues.
+    Le clone renuméroté est mémorisé au premier appel : la slide source ne
+    doit plus être modifiée ensuite.
+    """
+    if source in paquet['clones']:
+        element, rels = paquet['clones'][source]
+        partname = _ajouter_slide(paquet, copy.deepcopy(element))
+        paquet['rels'][partname] = dict(rels)
+        return partname
+    partname = _ajouter_slide(paquet, copy.deepcopy(xml_part(paquet, source)))
+    correspondance = {}
+    for rId, (type_rel, cible, externe) in relations(paquet, source).items():
+        if type_rel != RT_NOTES:
+            correspondance[rId] = ajouter_relation(paquet, partname, type_rel, cible, externe)
+    _renommer_rids(paquet['xml'][partname], correspondance)
+    paquet['clones'][source] = (copy.deepcopy(paquet['xml'][partname]), dict(relations(paquet, partname)))
+    return partname
+
+
+def exporter_slide(paquet, partname):
+    """
+    (XML sérialisé, relations) d'une slide, à importer dans une autre copie
+    du même modèle avec importer_slide_rendue.
+    """
+    return _serialiser(xml_part(paquet, partname)), dict(relations(paquet, partname))
+
+
+def importer_slide_rendue(paquet, octets, rels, medias):
+    """
+    Ajoute en fin de présentation une slide rendue dans une autre copie du
+    même modèle (rendu parallèle) : XML `octets` et relations `rels`
+    ({rId: (type, cible, externe)}). Les médias créés par l'autre copie
+    (`medias`, part -> octets) sont ajoutés comme avec ajouter_media, donc
+    dédoublonnés et numérotés dans l'ordre d'import. Le XML n'est reparsé
+    que si des rId changent ; sinon les octets sont écrits tels quels.
+    """
+    partname = _ajouter_slide(paquet, octets)
+    correspondance = {}
+    for rId, (type_rel, cible, externe) in rels.items():
+        if cible in medias:
+            correspondance[rId] = ajouter_media(paquet, partname, medias[cible])[0]
+        else:
+            correspondance[rId] = ajouter_relation(paquet, partname, type_rel, cible, externe)
+    if any(k != v for k, v in correspondance.items()):
+        _renommer_rids(xml_part(paquet, partname), correspondance)
+    return partname
+
+
+def _renommer_rids(racine, correspondance):
+    if all(k == v for k, v in correspondance.items()):
+        return
+    prefixe = f"{{{NS['r']}}}"
+    for el in racine.iter():
+        for attr, val in el.attrib.items():
+            if attr.startswith(prefixe) and val in correspondance:
+                el.set(attr, correspondance[val])
+
+
+def supprimer_slide(paquet, partname):
+    """
+    Retire une slide de la présentation (sa part n'est plus écrite).
+    """
+    rels = relations(paquet, paquet['presentation'])
+    for sld in _liste_slides(paquet):
+        rId = sld.get(_q('r:id'))
+        if rels[rId][1] == partname:
+            sld.getparent().remove(sld)
+            del rels[rId]
+            paquet['rids_libres'].pop(paquet['presentation'], None)
+            paquet['dernier_sld_id'] = None
+            return True
+    logging.getLogger(__name__).warning("Slide à supprimer introuvable.")
+    return False
+
+
+def deplacer_dernieres_slides(paquet, nombre, position):
+    """
+    Déplace les `nombre` dernières slides à l'index `position` ; les parts
+    de slides sont renumérotées dans l'ordre à l'enregistrement.
+    """
+    if nombre <= 0:
+        return
+    sld_lst = _liste_slides(paquet)
+    dernieres = list(sld_lst)[-nombre:]
+    for i, sld in enumerate(dernieres):
+        sld_lst.remove(sld)
+        sld_lst.insert(position + i, sld)
+    paquet['renommer_slides'] = True
+
+
+# --- Médias ---
+
+def _extension_image(octets):
+    if octets[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if octets[:2] == b'\xff\xd8':
+        return 'jpg'
+    if octets[:4] == b'GIF8':
+        return 'gif'
+    if octets[:2] == b'BM':
+        return 'bmp'
+    if octets[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'tiff'
+    from PIL import Image
+    with Image.open(BytesIO(octets)) as img:
+        return {'JPEG': 'jpg'}.get(img.format, img.format.lower())
+
+
+def ajouter_media(paquet, source, octets):
+    """
+    Relie `source` à une part image contenant `octets` (réutilisée si un
+    média identique existe déjà, comme get_or_add_image_part).
+    Renvoie (rId, extension).
+    """
+    if paquet['medias'] is None:
+        paquet['medias'] = {hashlib.sha1(blob).hexdigest(): nom for nom, blob in paquet['membres'].items()
+                            if nom.startswith('/ppt/media/')}
+    sha1 = hashlib.sha1(octets).hexdigest()
+    ext = _extension_image(octets)
+    partname = paquet['medias'].get(sha1)
+    if partname is None:
+        indices = sorted(int(m.group(1)) for nom in paquet['medias'].values()
+                         for m in [re.match(r'/ppt/media/image(\d+)\.', nom)] if m)
+        n = next((i + 1 for i, idx in enumerate(indices) if i + 1 < idx), len(indices) + 1)
+        partname = f"/ppt/media/image{n}.{ext}"
+        paquet['membres'][partname] = octets
+        paquet['overrides'][partname] = TYPES_IMAGES.get(ext, f"image/{ext}")
+        paquet['medias'][sha1] = partname
+        compter('images_octets', len(octets))
+    else:
+        ext = partname.rpartition('.')[2]
+    return ajouter_relation(paquet, source, RT_IMAGE, partname), ext
+
+
+# --- Rendu d'une slide ---
+
+def formes(racine):
+    """
+    Shapes de premier niveau de la slide (indices de l'index modèle).
+    """
+    return [el for el in racine.find(_q('p:cSld')).find(_q('p:spTree')) if el.tag in BALISES_FORMES]
+
+
+def _echapper(texte):
+    # Même échappement des caractères de contrôle que python-pptx (run.text)
+    return re.sub(r'([\x00-\x08\x0B-\x1F])', lambda m: '_x%04X_' % ord(m.group(1)), texte)
+
+
+def remplacer_placeholders_xml(p, valeurs):
+    """
+    Équivalent XML de remplacer_placeholders_paragraphe sur un a:p :
+    seul le texte des a:t change, les a:rPr sont laissés intacts.
+    """
+    runs = p.findall(_q('a:r'))
+    ts = [r.find(_q('a:t')) for r in runs]
+    originaux = [(t.text or '') if t is not None else '' for t in ts]
+    textes, vides, nombre = substituer_placeholders(originaux, valeurs)
+    for k, r in enumerate(runs):
+        if k in vides:
+            p.remove(r)
+        elif textes[k] != originaux[k]:
+            ts[k].text = _echapper(textes[k])
+    return nombre
+
+
+def remplir_textes_xml(elements, textes, plan):
+    """
+    Remplacement des placeholders texte aux positions de l'index modèle.
+    """
+    par_paragraphe = {}
+    for ph, positions in plan:
+        for pos in positions:
+            par_paragraphe.setdefault((pos['shape'], pos['paragraphe']), {})[pos['texte']] = textes[ph]
+    remplaces = 0
+    for (s_idx, p_idx), valeurs in par_paragraphe.items():
+        paragraphes = elements[s_idx].find(_q('p:txBody')).findall(_q('a:p'))
+        remplaces += remplacer_placeholders_xml(paragraphes[p_idx], valeurs)
+    compter('placeholders_trouves', sum(len(positions) for _, positions in plan))
+    compter('placeholders_remplaces', remplaces)
+
+
+def geometrie(element):
+    """
+    (x, y, cx, cy) EMU d'une forme, ou None si elle hérite sa position.
+    """
+    xfrm = element.find(f"{_q('p:spPr')}/{_q('a:xfrm')}")
+    if xfrm is None:
+        return None
+    off, ext = xfrm.find(_q('a:off')), xfrm.find(_q('a:ext'))
+    return int(off.get('x')), int(off.get('y')), int(ext.get('cx')), int(ext.get('cy'))
+
+
+def _prochain_id(racine):
+    ids = [int(v) for v in racine.xpath('//@id') if v.isdigit()]
+    return max(ids) + 1 if ids else 1
+
+
+def _ajouter_pic(racine, shape_id, nom, descr, rId, x, y, w, h):
+    pic = _parse(_MODELE_PIC)
+    cNvPr = pic.find(f"{_q('p:nvPicPr')}/{_q('p:cNvPr')}")
+    cNvPr.set('id', str(shape_id))
+    cNvPr.set('name', nom)
+    cNvPr.set('descr', descr)
+    pic.find(f"{_q('p:blipFill')}/{_q('a:blip')}").set(_q('r:embed'), rId)
+    xfrm = pic.find(f"{_q('p:spPr')}/{_q('a:xfrm')}")
+    xfrm.find(_q('a:off')).attrib.update({'x': str(int(x)), 'y': str(int(y))})
+    xfrm.find(_q('a:ext')).attrib.update({'cx': str(int(w)), 'cy': str(int(h))})
+    sp_tree = racine.find(_q('p:cSld')).find(_q('p:spTree'))
+    ext_lst = sp_tree.find(_q('p:extLst'))
+    if ext_lst is not None:
+        ext_lst.addprevious(pic)
+    else:
+        sp_tree.append(pic)
+    return pic
+
+
+def remplacer_image_xml(paquet, partname, elements, cible, image_path, dpi=None, qualite=85, cache_dir=None,
+                        image=None):
+    """
+    Équivalent XML de remplacer_image : la shape `cible` est remplacée par
+    l'image (réduite à la taille de la zone si `dpi` est fourni).
+    `image` : (octets, nom) déjà chargés par le préchargement.
+    """
+    from utils.image_utils import charger_image
+    logger = logging.getLogger(__name__)
+    if image is None and not os.path.exists(image_path):
+        logger.warning(f"Image non trouvée: {image_path}")
+        return False
+    if cible is None:
+        cible = next((el for el in elements if el.tag == _q('p:pic')), None)
+    boite = geometrie(cible) if cible is not None else None
+    if boite is None:
+        logger.warning("Placeholder image 'IMAGE_PROJET' non trouvé.")
+        return False
+    racine = paquet['xml'][partname]
+    cible.getparent().remove(cible)
+    octets, nom = image if image is not None else charger_image(image_path, boite[2], boite[3], dpi, qualite,
+                                                                cache_dir)
+    rId, ext = ajouter_media(paquet, partname, octets)
+    _ajouter_pic(racine, _prochain_id(racine), 'IMAGE_PROJET', nom or f"image.{ext}", rId, *boite)
+    return True
+
+
+def placer_blasons_xml(paquet, partname, centre, projet, mapping_blasons, logos_dir, valeur_active='x'):
+    """
+    Équivalent XML de gerer_blasons_ameliore.
+    """
+    from utils.assets_utils import lire_logo
+    from utils.blasons_utils import disposition_blasons
+    actifs = [filename for col, filename in mapping_blasons.items()
+              if str(projet.get(col, '')).strip().lower() == valeur_active.lower()
+              and lire_logo(logos_dir, filename) is not None]
+    if not actifs:
+        return []
+    racine = paquet['xml'][partname]
+    boite = geometrie(centre) if centre is not None else None
+    if boite is not None:
+        x, y, w, h = boite
+        boite = (x + w//2, y + h//2, w, h)
+        centre.getparent().remove(centre)
+    else:
+        sld_sz = xml_part(paquet, paquet['presentation']).find(_q('p:sldSz'))
+        boite = (int(sld_sz.get('cx'))//2, int(sld_sz.get('cy'))//2, 1000000, 1000000)
+    shape_id = _prochain_id(racine)
+    for i, (filename, position) in enumerate(zip(actifs, disposition_blasons(len(actifs), boite))):
+        rId, _ = ajouter_media(paquet, partname, lire_logo(logos_dir, filename))
+        _ajouter_pic(racine, shape_id + i, f"Picture {shape_id + i - 1}", filename, rId, *position)
+    compter('blasons_places', len(actifs))
+    return [os.path.join(logos_dir, filename) for filename in actifs]
+
+
+# --- Écriture ---
+
+def _parts_atteintes(paquet):
+    """
+    Parts atteignables depuis les relations du paquet, dans l'ordre de
+    parcours de python-pptx (les slides retirées ne sont plus écrites).
+    """
+    vues = []
+    deja = set()
+    pile = [iter(relations(paquet, '/').values())]
+    while pile:
+        rel = next(pile[-1], None)
+        if rel is None:
+            pile.pop()
+            continue
+        _, cible, externe = rel
+        if externe or cible in deja or (cible not in paquet['membres'] and cible not in paquet['xml']):
+            continue
+        deja.add(cible)
+        vues.append(cible)
+        pile.append(iter(relations(paquet, cible).values()))
+    return vues
+
+
+def _xml_relations(rels, source):
+    from lxml import etree
+    racine = etree.Element(f'{{{NS_RELS}}}Relationships', nsmap={None: NS_RELS})
+    base = posixpath.dirname(source) if source != '/' else '/'
+    for rId, (type_rel, cible, externe) in rels.items():
+        attributs = {'Id': rId, 'Type': type_rel,
+                     'Target': cible if externe else posixpath.relpath(cible, base)}
+        if externe:
+            attributs['TargetMode'] = 'External'
+        etree.SubElement(racine, f'{{{NS_RELS}}}Relationship', attributs)
+    return _serialiser(racine)
+
+
+def ecrire_paquet(paquet, destination, niveau_compression=6):
+    """
+    Écrit le paquet dans `destination` (chemin ou flux) : parts XML
+    modifiées re-sérialisées, autres parts recopiées, médias non recompressés.
+    """
+    from lxml import etree
+    parts = _parts_atteintes(paquet)
+    renommage = {}
+    if paquet['renommer_slides']:
+        renommage = {nom: f"/ppt/slides/slide{i}.xml" for i, nom in enumerate(slides(paquet), 1)}
+
+    def nom(partname):
+        return renommage.get(partname, partname)
+
+    defaults = {'rels': CT_RELS, 'xml': CT_XML}
+    overrides = {}
+    for partname in parts:
+        type_contenu = type_part(paquet, partname)
+        ext = partname.rpartition('.')[2]
+        if (ext.lower(), type_contenu) in DEFAULTS:
+            defaults[ext] = type_contenu
+        else:
+            overrides[nom(partname)] = type_contenu
+    types = etree.Element(f'{{{NS_TYPES}}}Types', nsmap={None: NS_TYPES})
+    for ext, type_contenu in sorted(defaults.items()):
+        etree.SubElement(types, f'{{{NS_TYPES}}}Default', {'Extension': ext, 'ContentType': type_contenu})
+    for partname, type_contenu in sorted(overrides.items()):
+        etree.SubElement(types, f'{{{NS_TYPES}}}Override', {'PartName': partname, 'ContentType': type_contenu})
+
+    def rels_renommees(partname):
+        return {rId: (t, c if e else nom(c), e) for rId, (t, c, e) in relations(paquet, partname).items()}
+
+    with zipfile.ZipFile(destination, 'w', compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=niveau_compression, strict_timestamps=False) as zf:
+        zf.writestr('[Content_Types].xml', _serialiser(types))
+        zf.writestr('_rels/.rels', _xml_relations(rels_renommees('/'), '/'))
+        for partname in parts:
+            membre = nom(partname)[1:]
+            if partname in paquet['xml']:
+                zf.writestr(membre, _serialiser(paquet['xml'][partname]))
+            elif partname.rpartition('.')[2].lower() in EXTENSIONS_COMPRESSEES:
+                zf.writestr(membre, paquet['membres'][partname], compress_type=zipfile.ZIP_STORED)
+            else:
+                zf.writestr(membre, paquet['membres'][partname])
+            rels = rels_renommees(partname)
+            if rels:
+                zf.writestr(_nom_rels(nom(partname))[1:], _xml_relations(rels, nom(partname)))
+    return destination
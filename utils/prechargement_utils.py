@@ -0,0 +1,89 @@
+# Préchargement des images : un pool de threads lit (et réduit) les images
+# des lignes à venir pendant que la boucle de rendu remplit les slides.
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.assets_utils import lire_logo
+from utils.image_utils import charger_image
+
+
+class Prechargeur:
+    """
+    Charge à l'avance l'image projet de chaque ligne. `taches[i]` vaut
+    (chemin, largeur EMU, hauteur EMU) de l'image de la ligne i, ou None.
+    Au plus `fenetre` lignes sont chargées d'avance, et le chargement
+    s'arrête tant que `max_octets` octets attendent d'être consommés.
+    Une même image (même chemin, même zone) n'est chargée qu'une fois pour
+    toutes les lignes de la fenêtre qui l'utilisent.
+    `logos` (dossier, noms de fichiers) sont lus une fois en tâche de fond.
+    """
+
+    def __init__(self, taches, options_image, threads, fenetre, max_octets, logos=None):
+        self.taches = taches
+        self.options_image = options_image
+        self.fenetre = fenetre
+        self.max_octets = max_octets
+        self.futures = {}
+        self.en_cours = {}
+        self.octets = 0
+        self.suivante = 0
+        self.verrou = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='prechargement')
+        if logos:
+            logos_dir, noms = logos
+            for nom in noms:
+                self._soumettre(lire_logo, logos_dir, nom)
+        self._remplir()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    def _soumettre(self, fonction, *args):
+        # Contexte copié : les compteurs du rapport restent actifs dans les threads
+        return self.pool.submit(contextvars.copy_context().run, fonction, *args)
+
+    def _charger(self, chemin, largeur, hauteur):
+        image = charger_image(chemin, largeur, hauteur, **self.options_image)
+        with self.verrou:
+            self.octets += len(image[0])
+        return image
+
+    def _remplir(self):
+        while (self.suivante < len(self.taches) and len(self.futures) < self.fenetre
+               and self.octets < self.max_octets):
+            tache = self.taches[self.suivante]
+            if tache is not None:
+                if tache not in self.en_cours:
+                    self.en_cours[tache] = self._soumettre(self._charger, *tache)
+                self.futures[self.suivante] = self.en_cours[tache]
+            self.suivante += 1
+
+    def prendre(self, i):
+        """
+        (octets, nom) de l'image de la ligne `i`, ou None si elle n'a pas été
+        préchargée (pas d'image, échec, budget atteint) : la slide lit alors
+        l'image elle-même.
+        """
+        future = self.futures.pop(i, None)
+        image = None
+        if future is not None:
+            try:
+                image = future.result()
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Préchargement de l'image ligne {i} échoué: {e}")
+            # Dernière ligne de la fenêtre à utiliser cette image : octets libérés
+            if future not in self.futures.values():
+                del self.en_cours[self.taches[i]]
+                if image is not None:
+                    with self.verrou:
+                        self.octets -= len(image[0])
+        self._remplir()
+        return image
+
+    def fermer(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,98 @@
+# Client du service local de rendu (service.py), en urllib seul.
+import json
+import logging
+import time
+import urllib.error
+import urllib.request
+from io import BytesIO
+
+from utils.template_utils import hash_contenu
+
+# Délai maximal d'une requête au service (secondes)
+DELAI_REQUETE = 30
+
+
+class ServiceIndisponible(Exception):
+    """
+    Service injoignable, file pleine ou réponse inattendue.
+    """
+
+
+def _requete(url, methode='GET', corps=None, type_contenu='application/json', brut=False):
+    requete = urllib.request.Request(url, data=corps, method=methode)
+    if corps is not None:
+        requete.add_header('Content-Type', type_contenu)
+    try:
+        with urllib.request.urlopen(requete, timeout=DELAI_REQUETE) as reponse:
+            data = reponse.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise ServiceIndisponible(f"{methode} {url} : HTTP {e.code} {e.read().decode('utf-8', 'replace')}") from e
+    except (urllib.error.URLError, OSError) as e:
+        raise ServiceIndisponible(f"{methode} {url} : {e}") from e
+    return data if brut else json.loads(data)
+
+
+def service_disponible(base_url):
+    """
+    True si le service répond sur `base_url`.
+    """
+    try:
+        return _requete(f"{base_url}/sante") is not None
+    except ServiceIndisponible:
+        return False
+
+
+def soumettre_rendu(base_url, modele, df, **params):
+    """
+    Envoie le modèle (octets, si le service ne le connaît pas encore) puis
+    met en file le rendu de `df`. `params` : mapping, img_dir, logos_dir,
+    valeur_blason, slides_prototypes, image_dpi, moteur, rapport.
+    Renvoie l'id du rendu.
+    """
+    cle = hash_contenu(modele)
+    if _requete(f"{base_url}/modeles/{cle}") is None:
+        _requete(f"{base_url}/modeles", 'POST', modele, 'application/octet-stream')
+        logging.getLogger(__name__).info(f"Modèle {cle[:12]} envoyé au service de rendu")
+    corps = {**params, 'modele': cle, 'lignes': json.loads(df.to_json(orient='table', index=False))}
+    reponse = _requete(f"{base_url}/rendus", 'POST', json.dumps(corps, ensure_ascii=False).encode('utf-8'))
+    if reponse is None:
+        raise ServiceIndisponible('modèle inconnu du service')
+    return reponse['rendu']
+
+
+def etat_rendu(base_url, rendu_id):
+    """
+    État d'un rendu : {'etat', 'position', 'faites', 'total', 'secondes',
+    'erreur', 'rapport'}, ou None s'il est inconnu.
+    """
+    return _requete(f"{base_url}/rendus/{rendu_id}")
+
+
+def attendre_rendu(base_url, rendu_id, suivi=None, intervalle=0.5):
+    """
+    Interroge le service jusqu'à la fin du rendu ; `suivi` reçoit chaque
+    état. Renvoie l'état final.
+    """
+    while True:
+        etat = etat_rendu(base_url, rendu_id)
+        if etat is None:
+            raise ServiceIndisponible(f"rendu {rendu_id} inconnu du service")
+        if suivi:
+            suivi(etat)
+        if etat['etat'] in ('termine', 'echec'):
+            return etat
+        time.sleep(intervalle)
+
+
+def telecharger_rendu(base_url, rendu_id, supprimer=True):
+    """
+    PPTX d'un rendu terminé (BytesIO) ; supprimé du service ensuite.
+    """
+    data = _requete(f"{base_url}/rendus/{rendu_id}/pptx", brut=True)
+    if data is None:
+        raise ServiceIndisponible(f"rendu {rendu_id} introuvable")
+    if supprimer:
+        _requete(f"{base_url}/rendus/{rendu_id}", 'DELETE')
+    return BytesIO(data)
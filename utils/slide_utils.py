@@ -0,0 +1,152 @@
+import copy
+import logging
+
+# Namespace des attributs r:id / r:embed / r:link
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+
+def _nouvelle_part_slide(prs, source):
+    """
+    Crée une part de slide avec une copie du XML de `source` et l'ajoute à la
+    fin de la présentation (avant tout ajout de média, pour que les noms
+    de parts attribués ensuite tiennent compte de cette slide).
+    """
+    from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+    from pptx.parts.slide import SlidePart
+    partname = prs.part._next_slide_partname
+    part = SlidePart(partname, CT.PML_SLIDE, prs.part.package, copy.deepcopy(source._element))
+    rId = prs.part.relate_to(part, RT.SLIDE)
+    prs.slides._sldIdLst.add_sldId(rId)
+    return part
+
+
+def _renumeroter_relations(part, correspondance):
+    """
+    Renumérote les références r:* du XML copié selon `correspondance`
+    (rId source -> rId cible) et renvoie la slide.
+    """
+    if any(k != v for k, v in correspondance.items()):
+        for el in part._element.iter():
+            for attr, val in el.attrib.items():
+                if attr.startswith(f'{{{NS_REL}}}') and val in correspondance:
+                    el.set(attr, correspondance[val])
+    return part.slide
+
+
+def dupliquer_slide(prs, source):
+    """
+    Clone une slide modèle à la fin de la présentation.
+    Le XML est copié, mais layout, master et médias sont partagés
+    (les relations pointent vers les mêmes parts, sans recopie).
+    """
+    from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+    part = _nouvelle_part_slide(prs, source)
+
+    # Report des relations de la slide source vers les mêmes parts
+    correspondance = {}
+    for rId, rel in source.part.rels.items():
+        if rel.reltype == RT.NOTES_SLIDE:
+            continue
+        if rel.is_external:
+            correspondance[rId] = part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+        else:
+            correspondance[rId] = part.relate_to(rel.target_part, rel.reltype)
+
+    return _renumeroter_relations(part, correspondance)
+
+
+def deplacer_dernieres_slides(prs, nombre, position):
+    """
+    Déplace les `nombre` dernières slides à l'index `position`
+    (en une seule passe sur la liste des slides).
+    """
+    if nombre <= 0:
+        return
+    sld_id_lst = prs.slides._sldIdLst
+    dernieres = list(sld_id_lst)[-nombre:]
+    for i, sld_id in enumerate(dernieres):
+        sld_id_lst.remove(sld_id)
+        sld_id_lst.insert(position + i, sld_id)
+    prs.part.rename_slide_parts([sld_id.rId for sld_id in sld_id_lst])
+
+
+def supprimer_slide(prs, slide):
+    """
+    Retire une slide de la présentation (la part n'est plus enregistrée).
+    """
+    sld_id_lst = prs.slides._sldIdLst
+    for sld_id in sld_id_lst:
+        if prs.part.related_part(sld_id.rId) is slide.part:
+            rId = sld_id.rId
+            sld_id_lst.remove(sld_id)
+            prs.part.drop_rel(rId)
+            return True
+    logging.getLogger(__name__).warning("Slide à supprimer introuvable.")
+    return False
+
+
+def contexte_import(prs):
+    """
+    Prépare l'import de slides venant d'un autre deck construit sur le même
+    modèle : parts de `prs` par nom, et correspondances déjà établies
+    (part source -> part cible) pour n'importer chaque média qu'une fois.
+    """
+    return {
+        'par_nom': {part.partname: part for part in prs.part.package.iter_parts()},
+        'parts': {},
+    }
+
+
+def importer_slide(prs, source, contexte):
+    """
+    Copie à la fin de `prs` une slide provenant d'un autre deck construit
+    sur le même modèle (layouts et médias du modèle retrouvés par nom de part).
+    Renvoie la nouvelle slide, ou None si la slide contient des relations
+    non prises en charge (elle doit alors être régénérée).
+    """
+    from io import BytesIO
+    from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+    par_nom = contexte['par_nom']
+    rels = [(rId, rel) for rId, rel in source.part.rels.items() if rel.reltype != RT.NOTES_SLIDE]
+    for rId, rel in rels:
+        if rel.is_external:
+            continue
+        if rel.reltype not in (RT.SLIDE_LAYOUT, RT.IMAGE):
+            return None
+        if rel.reltype == RT.SLIDE_LAYOUT and rel.target_part.partname not in par_nom:
+            return None
+
+    part = _nouvelle_part_slide(prs, source)
+    correspondance = {}
+    for rId, rel in rels:
+        if rel.is_external:
+            correspondance[rId] = part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            continue
+        cible = contexte['parts'].get(rel.target_part)
+        if cible is None:
+            meme_nom = par_nom.get(rel.target_part.partname)
+            if rel.reltype == RT.SLIDE_LAYOUT or (meme_nom is not None and meme_nom.blob == rel.target_part.blob):
+                cible = meme_nom
+            else:
+                cible, _ = part.get_or_add_image_part(BytesIO(rel.target_part.blob))
+            contexte['parts'][rel.target_part] = cible
+        correspondance[rId] = part.relate_to(cible, rel.reltype)
+
+    return _renumeroter_relations(part, correspondance)
+
+
+def remplacer_slide(prs, ancienne, nouvelle):
+    """
+    Met `nouvelle` à la place de `ancienne` dans l'ordre des slides
+    (et sous son nom de part), puis retire `ancienne`.
+    """
+    sld_id_lst = prs.slides._sldIdLst
+    ids = list(sld_id_lst)
+    position = next(i for i, s in enumerate(ids) if prs.part.related_part(s.rId) is ancienne.part)
+    sld_id = next(s for s in ids if prs.part.related_part(s.rId) is nouvelle.part)
+    sld_id_lst.remove(sld_id)
+    sld_id_lst.insert(position, sld_id)
+    supprimer_slide(prs, ancienne)
+    # La nouvelle slide reprend le nom de part libéré
+    nouvelle.part.partname = ancienne.part.partname
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import logging
+import os
+
+# Version du format d'index : à incrémenter si la structure change
+INDEX_VERSION = 1
+
+# Index déjà compilés dans ce processus (hash -> index)
+_INDEX_MEMOIRE = {}
+
+
+def lire_octets(source):
+    """
+    Renvoie le contenu binaire d'un chemin ou d'un objet fichier
+    (UploadedFile Streamlit, BytesIO...), sans consommer le flux.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read()
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    pos = source.tell()
+    data = source.read()
+    source.seek(pos)
+    return data
+
+
+def hash_contenu(data):
+    """
+    Empreinte SHA-256 d'un contenu binaire.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def _trouver_placeholders(texte):
+    """
+    Renvoie les (début, fin) des placeholders {{...}} d'un texte.
+    """
+    spans = []
+    idx = 0
+    while True:
+        start = texte.find('{{', idx)
+        if start == -1:
+            break
+        end = texte.find('}}', start)
+        if end == -1:
+            break
+        spans.append((start, end + 2))
+        idx = end + 2
+    return spans
+
+
+def _runs_couverts(runs_textes, start, end):
+    """
+    Indices [premier, dernier] des runs couvrant la plage [start, end[
+    du texte concaténé des runs.
+    """
+    premier = dernier = None
+    pos = 0
+    for i, texte in enumerate(runs_textes):
+        fin = pos + len(texte)
+        if premier is None and start < fin:
+            premier = i
+        if end <= fin:
+            dernier = i
+            break
+        pos = fin
+    if premier is None or dernier is None:
+        return None
+    return [premier, dernier]
+
+
+def compiler_slide(slide):
+    """
+    Indexe une slide : positions (shape, paragraphe, runs) de chaque
+    placeholder texte, et emplacements de IMAGE_PROJET et blason_centre.
+    """
+    placeholders = {}
+    image_projet = None
+    premiere_image = None
+    blason_centre = None
+    for s_idx, shape in enumerate(slide.shapes):
+        nom = getattr(shape, 'name', '')
+        if nom == 'IMAGE_PROJET' and image_projet is None:
+            image_projet = s_idx
+        elif nom == 'blason_centre' and blason_centre is None:
+            blason_centre = s_idx
+        if shape.shape_type == 13 and premiere_image is None:  # picture
+            premiere_image = s_idx
+        if not shape.has_text_frame:
+            continue
+        for p_idx, para in enumerate(shape.text_frame.paragraphs):
+            texte = para.text
+            if '{{' not in texte:
+                continue
+            runs_textes = [r.text for r in para.runs]
+            texte_runs = ''.join(runs_textes)
+            for start, end in _trouver_placeholders(texte):
+                ph = texte[start:end]
+                pos = texte_runs.find(ph)
+                runs = _runs_couverts(runs_textes, pos, pos + len(ph)) if pos != -1 else None
+                placeholders.setdefault(ph.strip(), []).append({
+                    'texte': ph,
+                    'shape': s_idx,
+                    'paragraphe': p_idx,
+                    'runs': runs,
+                })
+    return {
+        'placeholders': placeholders,
+        'image_projet': image_projet if image_projet is not None else premiere_image,
+        'blason_centre': blason_centre,
+    }
+
+
+def compiler_modele(prs):
+    """
+    Compile l'index complet d'une présentation modèle (une entrée par slide).
+    """
+    return {
+        'version': INDEX_VERSION,
+        'slides': [compiler_slide(slide) for slide in prs.slides],
+    }
+
+
+def charger_index_modele(data, prs, cache_dir=None):
+    """
+    Renvoie l'index compilé du modèle dont le contenu binaire est `data`.
+    L'index est mis en cache en mémoire et, si `cache_dir` est fourni,
+    persisté en JSON sous le hash du fichier : un modèle déjà vu n'est
+    jamais ré-analysé. `prs` peut être None : le modèle n'est alors ouvert
+    avec python-pptx que s'il faut le compiler.
+    """
+    logger = logging.getLogger(__name__)
+    cle = hash_contenu(data)
+    if cle in _INDEX_MEMOIRE:
+        return _INDEX_MEMOIRE[cle]
+
+    chemin = os.path.join(cache_dir, f"{cle}.v{INDEX_VERSION}.json") if cache_dir else None
+    index = None
+    if chemin and os.path.exists(chemin):
+        try:
+            with open(chemin, encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Index modèle illisible, recompilation: {e}")
+
+    if index is None:
+        if prs is None:
+            from io import BytesIO
+            from pptx import Presentation
+            prs = Presentation(BytesIO(data))
+        index = compiler_modele(prs)
+        if chemin:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                # Écriture atomique : plusieurs processus peuvent compiler en parallèle
+                tmp = f"{chemin}.{os.getpid()}.tmp"
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(index, f, ensure_ascii=False)
+                os.replace(tmp, chemin)
+            except OSError as e:
+                logger.warning(f"Impossible d'enregistrer l'index modèle: {e}")
+
+    _INDEX_MEMOIRE[cle] = index
+    return index
+
+
+def resoudre_placeholder(index_slide, placeholder):
+    """
+    Renvoie les positions d'un placeholder (recherche exacte puis
+    insensible à la casse), ou une liste vide.
+    """
+    phs = index_slide['placeholders']
+    norm = placeholder.strip()
+    if norm in phs:
+        return phs[norm]
+    norm = norm.lower()
+    return next((v for k, v in phs.items() if k.lower() == norm), [])